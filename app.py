@@ -1,8 +1,8 @@
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import streamlit as st
-import preprocessor, helper
-import matplotlib.pyplot as plt
-import seaborn as sns
-import emoji
+import preprocessor, helper, cache, sections, profiling, search
 
 # Set page configuration (must be the first Streamlit command)
 st.set_page_config(
@@ -97,351 +97,232 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+CACHE_MAX_BYTES = 2 * 1024 ** 3    # parsed chats and section results kept across reruns, least recently used evicted first
+SECTION_WORKERS = min(8, os.cpu_count() or 1)    # threads computing dashboard sections side by side
+CHAT_STORE_DIR = os.environ.get('MESSAGEMETRICS_STORE')    # directory keeping parsed chats across restarts; unset = off
+INGEST_MAX_BYTES = 1024 ** 2    # ingest states of recent exports, checked when a new upload may extend one of them
+# chat-level per-user counts (helper name, extra args) that are updated rather than rebuilt when an upload extends an earlier export
+CARRIED_COUNTS = [('build_emoji_counts', ()), ('build_word_counts', (helper.WORDCLOUD_STOPWORDS,))]
+TIMINGS_LOG = os.environ.get('MESSAGEMETRICS_TIMINGS_LOG')    # file the timing records are appended to as JSON lines; unset = not written
+
+@st.cache_resource
+def get_results_cache():
+    return cache.LRUCache(CACHE_MAX_BYTES)     #one cache per server process, shared by every session
+
+@st.cache_resource
+def get_chat_store():
+    return cache.ChatStore(CHAT_STORE_DIR) if CHAT_STORE_DIR else None
+
+@st.cache_resource
+def get_ingested():
+    return cache.LRUCache(INGEST_MAX_BYTES)     #chat hash -> preprocessor.Ingested
+
+@st.cache_resource
+def get_timings_log():
+    handler = logging.FileHandler(TIMINGS_LOG, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(message)s'))     #the records are JSON already
+    profiling.logger.addHandler(handler)
+    profiling.logger.setLevel(logging.INFO)
+    return handler
+
+results = get_results_cache()
+store = get_chat_store()
+ingested = get_ingested()
+if TIMINGS_LOG:
+    get_timings_log()
+
+def settings(args):
+    # plain-value arguments (sizes, limits, word sets) are part of a result's cache key; the frame is fixed by the chat hash
+    # and so are those of a shared result passed in
+    key = ()
+    for arg in args:
+        if isinstance(arg, sections.Shared):
+            key += (arg.name,) + settings(arg.args)
+        elif isinstance(arg, (str, int, float, frozenset)):
+            key += (arg,)
+    return key
+
+def find_previous(data):
+    # the largest earlier export this upload starts with, as (chat hash, df, cube, state), or None
+    candidates = dict(ingested.items())
+    if store:
+        for key in store.keys():
+            meta = None if key in candidates else store.meta(key)
+            if meta:
+                candidates[key] = preprocessor.Ingested(**meta)
+    for key, state in sorted(candidates.items(), key=lambda item: item[1].size, reverse=True):
+        if not preprocessor.extends(data, state):
+            continue
+        loaded = results.get((key, 'preprocess'))
+        if loaded is None and store:
+            df = store.load(key)
+            loaded = None if df is None else (df, helper.build_activity_cube(df))
+        if loaded is not None:
+            return key, loaded[0], loaded[1], state
+    return None
+
 st.sidebar.markdown("# 💬 MessageMetrics")
 
 uploaded_file = st.sidebar.file_uploader("Choose a file")
+
+# opt-in instrumentation: every helper computed in this run is timed and listed in the sidebar
+record_timings = st.sidebar.checkbox("Record timings", value=bool(TIMINGS_LOG))
+track_memory = record_timings and st.sidebar.checkbox("Track peak memory (slower, sections run one at a time)")
+profiling.track_memory(st.session_state.setdefault('memory_token', profiling.MemoryToken()), track_memory)
+timings = profiling.Timings(memory=track_memory) if record_timings else None
+
+def timed(name, selected_user, func, *args, **kwargs):
+    return timings.call(name, selected_user, func, *args, **kwargs) if timings else func(*args, **kwargs)
 if uploaded_file is not None:
-    bytes_data = uploaded_file.getvalue()
-    data = bytes_data.decode("utf-8")     #conversion of the bytes_data into readable text
-    df = preprocessor.preprocess(data)
+    chat_hash = cache.content_hash(uploaded_file)     #same export -> same key, whatever the file name
+
+    def load_chat():
+        df = timed('load_stored_chat', None, store.load, chat_hash) if store else None     #an export seen before is read back from disk
+        if df is not None:
+            meta = store.meta(chat_hash)
+            if meta:
+                ingested.put(chat_hash, preprocessor.Ingested(**meta))
+            return df, timed('build_activity_cube', None, helper.build_activity_cube, df)
+
+        data = uploaded_file.getvalue()
+        previous = find_previous(data)
+        if previous is None:
+            df, state, added, removed = timed('preprocess', None, preprocessor.ingest, data, compact=True)     #parses the export into the compact typed schema
+            if df.empty:
+                st.error("No messages found, is this a WhatsApp chat export?")
+                st.stop()
+            cube = timed('build_activity_cube', None, helper.build_activity_cube, df)     #per-user message counts by date/hour shared by the timeline and activity sections
+        else:
+            # a re-export of a chat loaded before: only the messages after the earlier export are parsed,
+            # and the earlier cube and per-user counts are updated with them
+            previous_hash, previous_df, previous_cube, previous_state = previous
+            df, state, added, removed = timed('preprocess', None, preprocessor.ingest, data, (previous_df, previous_state), compact=True)
+            cube = timed('update_activity_cube', None, helper.update_activity_cube, previous_cube, added, removed)
+            for name, args in CARRIED_COUNTS:
+                counts = results.get((previous_hash, name) + settings(args))
+                if counts is not None:
+                    build = getattr(helper, name)
+                    counts = helper.update_user_counts(counts, build(added, *args), build(removed, *args))
+                    results.put((chat_hash, name) + settings(args), counts)
+
+        if state is not None:
+            ingested.put(chat_hash, state)
+        if store:
+            store.save(chat_hash, df, None if state is None else state._asdict())
+        return df, cube
+
+    df, cube = results.get_or_compute((chat_hash, 'preprocess'), load_chat)
+
+    def cached(key, name, compute):
+        # the helper picked for profiling always runs, so there is something to profile
+        if timings and name == timings.profile:
+            value = compute()
+            results.put(key, value)
+            return value
+        return results.get_or_compute(key, compute)
+
+    def shared(name, *args):
+        # chat-level helper result, computed once per export and reused for every user
+        return cached((chat_hash, name) + settings(args), name, lambda: timed(name, None, getattr(helper, name), *args))
+
+    def analysis(name, *args):
+        # helper result for this export and the selected user, reused across reruns and when switching back to a user
+        def compute():
+            resolved = [shared(arg.name, *arg.args) if isinstance(arg, sections.Shared) else arg for arg in args]
+            return timed(name, selected_user, getattr(helper, name), *resolved)
+        return cached((chat_hash, selected_user, name) + settings(args), name, compute)
 
-    # Display the dataframe only once
-    st.dataframe(df, hide_index=True)
-    
     # fetch unique users
     user_list = df['user'].unique().tolist()     
     user_list.remove('group_notification')
     user_list.sort()
     user_list.insert(0, "Overall")
+    first_day, last_day = df['date'].min().date(), df['date'].max().date()
+
+    # the parsed messages a page at a time, filtered here: only the rows on screen are sent to the browser
+    with st.expander("📄 Messages", expanded=True):
+        col1, col2, col3 = st.columns([2, 2, 1])
+        browse_user = col1.selectbox("Sent by", user_list, key='browse_user')
+        browse_days = col2.date_input("Sent between", (first_day, last_day), min_value=first_day, max_value=last_day, key='browse_days')
+        rows = search.browse(df, None if browse_user == 'Overall' else browse_user,
+                             browse_days[0] if browse_days else None, browse_days[-1] if browse_days else None)
+        page = min(col3.number_input("Page", 1, search.pages(rows), 1, key='browse_page'), search.pages(rows))
+        st.dataframe(df.iloc[search.page(rows, page)], hide_index=True)
+        st.caption(f"{len(rows)} messages, page {page} of {search.pages(rows)}")
+
+    # full-text search; the index is built on the first query and cached with the export's other results
+    with st.expander("🔍 Search messages"):
+        query = st.text_input("Search", placeholder="words to find; end a word with * to match it as a prefix")
+        col1, col2 = st.columns(2)
+        search_user = col1.selectbox("Sent by", user_list, key='search_user')
+        days = col2.date_input("Sent between", (first_day, last_day), min_value=first_day, max_value=last_day, key='search_days')
+        if query:
+            with st.spinner("Indexing messages..."):
+                index = cached((chat_hash, 'search_index'), 'search_index', lambda: timed('search_index', None, search.SearchIndex, df))
+            rows = index.search(query, None if search_user == 'Overall' else search_user,
+                                days[0] if days else None, days[-1] if days else None)
+            page = min(st.number_input("Page", 1, search.pages(rows), 1, key='search_page'), search.pages(rows))     #a narrower search keeps the old page number
+            st.caption(f"{len(rows)} messages found, page {page} of {search.pages(rows)}")
+            st.dataframe(df.iloc[search.page(rows, page)][['date', 'user', 'message']], hide_index=True)
+
     selected_user = st.sidebar.selectbox("Show analysis w.r.t", user_list)
     
+    parallel = st.sidebar.checkbox("Compute sections in parallel", value=True) and not track_memory     #peaks are process-wide
+    st.sidebar.checkbox("Native charts for timelines", key='native_charts')     #Streamlit line charts instead of matplotlib images
+    idle_hours = st.sidebar.slider("Idle gap for response times (hours)", 1, 24, helper.RESPONSE_IDLE_SECONDS // 3600)     #slower replies end a silence
+    session_minutes = st.sidebar.slider("Conversation gap (minutes)", 10, 360, helper.SESSION_GAP_SECONDS // 60, step=10)     #a longer silence starts a new conversation
+    wordcloud_words = st.sidebar.slider("Wordcloud words", 50, 500, helper.WORDCLOUD_MAX_WORDS, step=50)     #fewer words lay out faster on large chats
+
+    # the analysis stays on screen across reruns; sections are only computed once they are loaded
+    loaded = st.session_state.setdefault('loaded_sections', set())
+    jobs = sections.section_jobs(selected_user, df, cube, wordcloud_words, idle_hours * 3600, session_minutes * 60)
+    if timings:
+        helper_names = {'chat_summary'} | {name for _, _, calls in jobs for name, _ in calls}
+        helper_names |= {arg.name for _, _, calls in jobs for _, args in calls for arg in args if isinstance(arg, sections.Shared)}
+        profiled = st.sidebar.selectbox("Profile a helper (cProfile)", ['None'] + sorted(helper_names))
+        timings.profile = None if profiled == 'None' else profiled
     if st.sidebar.button("Show analysis"):
-        num_messages, words, num_media_messages, links, num_emojis, num_stickers = helper.fetch_stats(selected_user,df)
-
-        st.title("Top Statistics")
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.markdown("### 📱 Total Messages")
-            st.title(num_messages)
-        with col2:
-            st.markdown("### 📝 Total Words")
-            st.title(words)
-        with col3:
-            st.markdown("### 🖼️ Total Media")
-            st.title(num_media_messages)
-
-        col4, col5, col6 = st.columns(3)
-        with col4:
-            st.markdown("### 🔗 Total Links")
-            st.title(links)
-        with col5:
-            st.markdown("### 😊 Total Emojis")
-            st.title(num_emojis)
-        with col6:
-            st.markdown("### 🎯 Total Stickers")
-            st.title(num_stickers)
-
-        # Chat age and first message
-        if selected_user == 'Overall':
-            chat_info = helper.get_chat_age(df)
-        else:
-            chat_info = helper.get_user_first_message(selected_user, df)
-            
-        st.title("📝 Chat Information")
-        col1, col2 = st.columns(2)
-        with col1:
-            st.info(f"First Message Date: **{chat_info['first_message_date']}**")
-        with col2:
-            if selected_user == 'Overall':
-                st.info(f"Chat Age: **{chat_info['chat_age']}**")
-
-        st.title("💬 First Message")
-        st.markdown(
-            f"""
-            <div style='padding: 1.5rem; border-radius: 8px; background-color: #ffffff; border-left: 5px solid #2c3e50; margin: 1rem 0; box-shadow: 0 2px 4px rgba(0,0,0,0.1);'>
-                <p style='color: #1f1f1f; font-weight: bold; margin-bottom: 8px; font-size: 1.2em;'>{chat_info['first_message_user']}</p>
-                <p style='color: #2c3e50; margin: 0; font-size: 1.3em; background-color: #f8f9fa; padding: 1rem; border-radius: 5px;'>{chat_info['first_message']}</p>
-                <p style='color: #666; font-size: 1em; margin-top: 12px;'>{chat_info['first_message_date']}</p>
-            </div>
-            """, 
-            unsafe_allow_html=True
-        )
-
-        # Voice Message Analysis
-        st.title("🎤 Voice Message Analysis")
-        voice_counts = helper.voice_message_analysis(selected_user, df)
-        
-        if not voice_counts.empty:
-            col1, col2 = st.columns(2)
-            with col1:
-                st.dataframe(voice_counts)
-            with col2:
-                fig, ax = plt.subplots(figsize=(10, 6))
-                width = 0.4 if selected_user != 'Overall' else 0.8
-                ax.bar(voice_counts['User'], voice_counts['Voice Message Count'], 
-                      width=width, color='#008080') #teal
-                ax.set_xlabel("User", fontsize=12)
-                ax.set_ylabel("Number of Voice Messages", fontsize=12)
-                plt.xticks(rotation='vertical' if len(user_list) > 3 else 'horizontal')
-                st.pyplot(fig)
-        else:
-            st.write("No voice messages found in the chat.")
-
-        # Most Active Users
-        if selected_user == 'Overall':
-            st.title("👥 Most Active Users")
-            x, new_df = helper.most_active_users(df)
-            fig, ax = plt.subplots()
-            col1, col2 = st.columns(2)
-            with col1:
-                ax.bar(x.index, x.values, color='#008080', width=0.8) #teal
-                plt.xticks(rotation='vertical' if len(user_list) > 3 else 'horizontal')
-                st.pyplot(fig)
-            with col2:
-                st.dataframe(new_df)
-        
-         # Call Analysis
-        st.title("📞 Call Analysis") 
-        call_data, call_message = helper.call_analysis(selected_user, df)
-        if call_message:
-            st.write(call_message)
-        else:
-            st.dataframe(call_data)
-            fig, ax = plt.subplots()
-            width = 0.4 if selected_user != 'Overall' else 0.8
-            ax.bar(call_data['Call Type'], call_data['Count'], color=['#39FF14', '#2a3439'], width=width)
-            ax.set_xlabel("Call Type", fontsize=12)
-            ax.set_ylabel("Count", fontsize=12)
-            ax.set_title("Number of Voice and Video Calls", fontsize=14)
-            st.pyplot(fig)
-        
-        # wordcloud
-        st.title("☁️ Wordcloud")   
-        wc = helper.create_wordcloud(selected_user, df)
-        fig, ax = plt.subplots()
-        ax.imshow(wc)
-        st.pyplot(fig)
-        
-        # emoji analysis
-        st.title("😀 Emoji Analysis")   
-        emoji_df = helper.emoji_helper(selected_user, df)   
-        col1, col2 = st.columns(2)
-        if emoji_df.empty:
-            st.write("No emojis found in the messages.")
-        else:
-            with col1:
-                st.dataframe(emoji_df)
-            with col2:
-                fig, ax = plt.subplots()
-                ax.pie(emoji_df['Count'], labels=emoji_df['Emoji'], autopct='%1.1f%%')
-                st.pyplot(fig)
-
-        # monthly timeline
-        st.title("📅 Monthly Timeline")   
-        monthly_timeline = helper.monthly_timeline(selected_user, df)    
-        fig, ax = plt.subplots()
-        ax.plot(monthly_timeline['month'], monthly_timeline['message'], color='#9955bb') #purple
-        plt.xticks(rotation='vertical')
-        st.pyplot(fig)
-
-        # daily timeline
-        st.title("📆 Daily Timeline")
-        daily_timeline = helper.daily_timeline(selected_user, df)
-        if daily_timeline is not None and not daily_timeline.empty:
-            fig, ax = plt.subplots()
-            ax.plot(daily_timeline['only_date'], daily_timeline['message'], color='#00416A') #dark blue
-            plt.xticks(rotation='vertical')
-            st.pyplot(fig)
-        else:
-            st.write("No data available for the daily timeline.")
-        
-        # activity charts
-        st.title("📈 Activity Charts")
-        col1,col2 = st.columns(2)
-        with col1:
-            st.header("Most busy day")
-            busy_day = helper.week_activity_map(selected_user, df)
-            fig, ax = plt.subplots()
-            ax.bar(busy_day.index, busy_day.values, color='#00416A') #blueberry
-            plt.xticks(rotation='vertical')
-            st.pyplot(fig)
-        with col2:
-            st.header("Most busy month")
-            busy_month = helper.month_activity_map(selected_user, df)
-            fig, ax = plt.subplots()
-            ax.bar(busy_month.index, busy_month.values, color='#65000B') # rosewood
-            plt.xticks(rotation='vertical')
-            st.pyplot(fig)
-        
-        # heatmap
-        st.title("📊 Activity Heatmap")
-        heatmap = helper.activity_heatmap(selected_user, df)
-        fig, ax = plt.subplots(figsize=(10, 6))
-        ax = sns.heatmap(heatmap)
-        st.pyplot(fig)
-
-        # response time analysis
-        st.title("⚡ Response Time Analysis")      
-        response_times, fastest_responder = helper.response_time_analysis(selected_user, df)
-
-        if not response_times.empty:
-            col1, col2 = st.columns(2)
-            with col1:
-                st.header("Average Response Time")
-                st.dataframe(response_times)
-            with col2:
-                if fastest_responder is not None:
-                    st.header("Fastest Responder")
-                    st.write(f"User: {fastest_responder['user']}")
-                    st.write(f"Average Response Time: {fastest_responder['avg_response_time']:.2f} seconds")
-                else:
-                    st.header("Response Time Analysis")
-                    st.write("No fastest responder data available.")
-        else:
-            st.write("No response time data available for analysis.")
-        
-        # first message of the day
-        st.title("🌅 First Message of the Day")  
-        first_message_counts = helper.first_message_of_day(selected_user, df)
-
-        if selected_user == 'Overall' and not first_message_counts.empty:
-            fig, ax = plt.subplots(figsize=(10, 6))
-            ax.bar(first_message_counts['user'], first_message_counts['first_message_count'], width=0.8, color='#008080') #teal
-            ax.set_xlabel("User", fontsize=12)
-            ax.set_ylabel("First Message Count", fontsize=12)
-            plt.xticks(rotation='vertical' if len(user_list) > 3 else 'horizontal')
-            st.pyplot(fig)
-        elif not first_message_counts.empty:
-            st.dataframe(first_message_counts)
-        else:
-            st.write("No data available for first message analysis.")
-        
-        # late night activity
-        st.title("🌙 Late Night Activity (12 AM - 3 AM)")   
-        late_night_counts = helper.late_night_activity(selected_user, df)
-
-        if selected_user == 'Overall' and not late_night_counts.empty:
-            fig, ax = plt.subplots(figsize=(10, 6))
-            ax.bar(late_night_counts['user'], late_night_counts['late_night_message_count'], width=0.8, color='#008080') #teal
-            ax.set_xlabel("User", fontsize=12)
-            ax.set_ylabel("No. of Messages", fontsize=12)
-            plt.xticks(rotation='vertical' if len(user_list) > 3 else 'horizontal')
-            st.pyplot(fig)
-        elif not late_night_counts.empty:
-            st.dataframe(late_night_counts)
-        else:
-            st.write("No late-night activity detected.")
-        
-        # Longest Streaks Analysis
-        st.title("🔥 Top 10 Days with Continuous Chat Activity")      
-        top_days = helper.longest_streaks(selected_user,df)
-
-        if not top_days.empty:
-            fig, ax = plt.subplots(figsize=(10, 6))
-            
-            # Create the bar chart
-            ax.bar(top_days['only_date'].astype(str), top_days['message_count'], color='#00416A') #dark blue
-                            
-            ax.set_xlabel("Date", fontsize=12)
-            ax.set_ylabel("Number of Messages", fontsize=12)
-            plt.xticks(rotation='vertical')
-            st.pyplot(fig)
-        else:
-            st.write("No data available for longest streaks analysis.")
-        
-        # Text Length Analysis
-        st.title("📏 Text Length Analysis")
-        text_length_df = helper.text_length_analysis(selected_user, df)
-        
-        if not text_length_df.empty:
-            if selected_user == 'Overall':
-                fig, ax = plt.subplots(figsize=(10, 6))
-                ax.bar(text_length_df['User'], text_length_df['Average Message Length'], width=0.8, color='#008080') #teal
-                ax.set_xlabel("User")
-                ax.set_ylabel("Average Message Length (characters)")
-                plt.xticks(rotation='vertical' if len(user_list) > 3 else 'horizontal')
-                st.pyplot(fig)
-            else:
-                # For individual user, show a metric display instead of bar chart
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.metric(
-                        label="Average Message Length",
-                        value=f"{text_length_df['Average Message Length'].iloc[0]:.1f} characters",
-                        help="Average number of characters per message"
-                    )
-                with col2:
-                    st.dataframe(text_length_df)
-        else:
-            st.write("No text length data available for analysis.")
-
-        # Message Deletion Analysis
-        st.title("🗑️ Message Deletion Analysis")
-        deletion_stats = helper.analyze_deleted_messages(selected_user, df)
-        
-        if not deletion_stats.empty:
-            col1, col2 = st.columns(2)
-            with col1:
-                st.dataframe(deletion_stats)
-            with col2:
-                fig, ax = plt.subplots(figsize=(10, 6))
-                width = 0.4 if selected_user != 'Overall' else 0.8
-                ax.bar(deletion_stats['User'], deletion_stats['Deleted Messages'], 
-                      width=width, color='#008080') #teal
-                ax.set_xlabel("User", fontsize=12)
-                ax.set_ylabel("Number of Deleted Messages", fontsize=12)
-                plt.xticks(rotation='vertical' if len(user_list) > 3 else 'horizontal')
-                
-                # Add percentage labels on top of bars
-                for i, v in enumerate(deletion_stats['Deleted Messages']):
-                    percentage = deletion_stats['Deletion Rate (%)'].iloc[i]
-                    ax.text(i, v, f'{percentage}%', 
-                           ha='center', va='bottom')
-                st.pyplot(fig)
-        else:
-            st.write("No deleted messages found in the chat.")
-
-        # Group Dynamics Analysis
-        st.title("💭 Group Dynamics Analysis")
-        mentions_summary, reply_summary, group_message = helper.analyze_group_dynamics(selected_user, df)
-        
-        if group_message:
-            st.write(group_message)
+        st.session_state['show_analysis'] = True
+    if st.sidebar.button("Load all sections"):
+        st.session_state['show_analysis'] = True
+        loaded.update(title for title, _, _ in jobs)
+
+    if st.session_state.get('show_analysis'):
+        # cheap headline numbers from the activity cube come first
+        sections.render_summary(selected_user, user_list, analysis('chat_summary', selected_user, df, cube))
+
+        slots = []
+        for title, _, _ in jobs:
+            st.title(title)
+            slot = st.empty()     #holds the load button until the section has been computed
+            if title not in loaded and slot.button("Load", key='load-' + title):
+                loaded.add(title)
+            slots.append(slot)
+
+        def compute(calls):
+            return [analysis(name, *args) for name, args in calls]
+
+        def render(i, section_results):
+            with slots[i].container():
+                jobs[i][1](selected_user, user_list, *section_results)
+
+        pending = [i for i, (title, _, _) in enumerate(jobs) if title in loaded]
+        if parallel:
+            # helpers run in worker threads on the shared frame (no copies); drawing stays on the script thread
+            with ThreadPoolExecutor(max_workers=SECTION_WORKERS) as pool:
+                futures = {pool.submit(compute, jobs[i][2]): i for i in pending}
+                for future in as_completed(futures):
+                    render(futures[future], future.result())
         else:
-            # Mentions Analysis
-            st.header("Mentions Analysis")
-            if not mentions_summary.empty:
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.dataframe(mentions_summary)
-                with col2:
-                    fig, ax = plt.subplots(figsize=(10, 6))
-                    width = 0.4 if selected_user != 'Overall' else 0.8
-                    ax.bar(mentions_summary['Mentioned_by'], mentions_summary['Mention_count'], 
-                          color='#4B0082', width=width)  # indigo
-                    plt.xticks(rotation='vertical')
-                    ax.set_xlabel("User")
-                    ax.set_ylabel("Number of Mentions Made")
-                    st.pyplot(fig)
-            else:
-                st.write("No mentions found in the chat")
-
-            # Reply Patterns Analysis
-            st.header("Reply Patterns")
-            if not reply_summary.empty:
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.dataframe(reply_summary)
-                with col2:
-                    # Create a heatmap of reply patterns
-                    reply_matrix = reply_summary.pivot_table(
-                        index='From', columns='To', values='Reply_count', fill_value=0
-                    )
-                    fig, ax = plt.subplots(figsize=(10, 6))
-                    sns.heatmap(reply_matrix, annot=True, cmap='YlOrRd', fmt='g')
-                    plt.title("Reply Patterns Heatmap")
-                    st.pyplot(fig)
-            else:
-                st.write("No reply patterns found in the chat")
-      
-      
\ No newline at end of file
+            for i in pending:
+                render(i, compute(jobs[i][2]))
+
+    if timings:
+        with st.sidebar.expander("⏱️ Timings", expanded=True):
+            table = timings.table()
+            st.caption(f"{len(table)} helper calls computed in this run, {table['seconds'].sum():.2f}s in total; cached results are not listed")
+            st.dataframe(table, hide_index=True)
+            st.download_button("Download JSON", timings.to_json(), file_name='timings.json', mime='application/json')
+            for name, report in timings.reports.items():
+                st.markdown(f"**cProfile: {name}**")
+                st.code(report)
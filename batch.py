@@ -0,0 +1,144 @@
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+import preprocessor, helper, sections
+
+# Headless batch analysis: every export in a directory is parsed and run through the same helper calls
+# as the dashboard sections, one chat per worker process, and the results are written per chat.
+#
+#   python batch.py exports/ results/ --format parquet --per-user --workers 8
+#
+# --format json writes <chat>.json with every result; --format parquet writes a <chat>/ directory with one
+# <helper>.parquet per table (a selected_user column tells the users apart) and values.json for the rest.
+
+SKIPPED = {'wordcloud_image'}    # rendered images, not analysis results
+
+def run_helpers(selected_user, df, cube, shared):
+    # {helper name: result} for one selected user; shared holds the chat-level results across users
+    def resolve(arg):
+        if isinstance(arg, sections.Shared):
+            if arg.name not in shared:
+                shared[arg.name] = getattr(helper, arg.name)(*arg.args)
+            return shared[arg.name]
+        return arg
+
+    results = {'chat_summary': helper.chat_summary(selected_user, df, cube)}
+    for title, renderer, calls in sections.section_jobs(selected_user, df, cube):
+        for name, args in calls:
+            if name not in SKIPPED:
+                results[name] = getattr(helper, name)(*map(resolve, args))
+    return results
+
+def split_result(name, result, tables, values):
+    # DataFrames and Series of counts become tables (a meaningful index becomes a column), an object Series is
+    # one record and kept as a value, tuples are split item by item (name_0, name_1, ...), anything else is a value
+    if isinstance(result, pd.DataFrame):
+        tables[name] = result if isinstance(result.index, pd.RangeIndex) else result.reset_index()
+    elif isinstance(result, pd.Series) and result.dtype == object:
+        values[name] = result.to_dict()
+    elif isinstance(result, pd.Series):
+        tables[name] = result.rename(result.name if result.name is not None else 'value').reset_index()
+    elif isinstance(result, tuple):
+        for i, item in enumerate(result):
+            split_result(name + '_' + str(i), item, tables, values)
+    else:
+        values[name] = result
+
+def to_plain(value):
+    # json.dumps fallback for numpy scalars and dates
+    if isinstance(value, np.generic):
+        return value.item()
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+def records(table):
+    return json.loads(table.to_json(orient='records', date_format='iso'))
+
+def write_results(results, path, output_format):
+    # results is {selected user: {helper name: result}}
+    split = {}
+    for user, user_results in results.items():
+        tables, values = {}, {}
+        for name, result in user_results.items():
+            split_result(name, result, tables, values)
+        split[user] = (tables, values)
+
+    if output_format == 'json':
+        document = {user: {'values': values, 'tables': {name: records(table) for name, table in tables.items()}}
+                    for user, (tables, values) in split.items()}
+        with open(path + '.json', 'w', encoding='utf-8') as out:
+            json.dump(document, out, ensure_ascii=False, default=to_plain)
+        return
+
+    os.makedirs(path, exist_ok=True)
+    by_name = {}
+    for user, (tables, values) in split.items():
+        for name, table in tables.items():
+            table = table.copy()
+            table.columns = [str(column) for column in table.columns]
+            table.insert(0, 'selected_user', user)
+            by_name.setdefault(name, []).append(table)
+    for name, user_tables in by_name.items():
+        pd.concat(user_tables, ignore_index=True).to_parquet(os.path.join(path, name + '.parquet'), index=False)
+    with open(os.path.join(path, 'values.json'), 'w', encoding='utf-8') as out:
+        json.dump({user: values for user, (tables, values) in split.items()}, out, ensure_ascii=False, default=to_plain)
+
+def analyze_chat(path, output_dir, output_format='json', per_user=False):
+    # runs in a worker process; returns the number of messages so the parent can report throughput
+    with open(path, 'rb') as export:
+        df = preprocessor.preprocess(export, compact=True)
+    if df.empty:
+        raise ValueError("no messages found, is this a chat export?")
+    cube = helper.build_activity_cube(df)
+
+    users = ['Overall']
+    if per_user:
+        users += sorted(set(df['user'].unique()) - {'group_notification'})
+    shared = {}
+    results = {user: run_helpers(user, df, cube, shared) for user in users}
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    write_results(results, os.path.join(output_dir, name), output_format)
+    return len(df)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze every chat export in a directory.")
+    parser.add_argument('exports', help="directory with the exported .txt chats")
+    parser.add_argument('output', help="directory the results are written to")
+    parser.add_argument('--format', choices=['json', 'parquet'], default='json', help="output format (default: json)")
+    parser.add_argument('--per-user', action='store_true', help="also analyze every participant, not only Overall")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="worker processes (default: one per core)")
+    parser.add_argument('--suffix', default='.txt', help="file name suffix of the exports (default: .txt)")
+    args = parser.parse_args(argv)
+
+    paths = sorted(os.path.join(args.exports, name) for name in os.listdir(args.exports) if name.endswith(args.suffix))
+    os.makedirs(args.output, exist_ok=True)
+
+    start = time.perf_counter()
+    chats = messages = failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(analyze_chat, path, args.output, args.format, args.per_user): path for path in paths}
+        for future in as_completed(futures):
+            try:
+                count = future.result()
+            except Exception as error:    # one broken export shouldn't stop the batch
+                failed += 1
+                print(f"failed: {futures[future]}: {error!r}", file=sys.stderr)
+                continue
+            chats += 1
+            messages += count
+    elapsed = time.perf_counter() - start
+
+    print(f"{chats} chats, {messages} messages in {elapsed:.2f}s "
+          f"({chats / elapsed:.2f} chats/s, {messages / elapsed:.0f} messages/s)"
+          + (f", {failed} failed" if failed else ""))
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
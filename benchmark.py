@@ -0,0 +1,237 @@
+import io
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tracemalloc
+from datetime import datetime, timedelta
+import pandas as pd
+import preprocessor, helper, sections, search
+
+# Benchmarks for preprocess and every helper the dashboard calls, on deterministic synthetic exports.
+#
+#   python benchmark.py --sizes 10000 100000 1000000 --output after.json --compare before.json
+#   python benchmark.py --generate chat.txt --messages 50000 --dialect ios_12h
+#   python benchmark.py --check
+#
+# Each helper is timed (best of --repeat runs) and its peak allocation is measured in a separate run under
+# tracemalloc, for Overall and for the most active participant. Results are saved as JSON; --compare prints
+# the time ratio against an earlier result file and exits with 1 when a step got slower than --threshold.
+
+WORDS = ['hello', 'ok', 'see', 'you', 'tomorrow', 'python', 'meeting', 'lunch', 'haha', 'sure', 'thanks',
+         'what', 'time', 'going', 'home', 'nice', 'great', 'call', 'later', 'yes', 'no', 'maybe', 'weekend',
+         'train', 'coffee', 'project', 'deadline', 'photos', 'party', 'happy', 'birthday', "that's", 'cool']
+EMOJIS = ['😂', '❤️', '👍', '🙏', '😊', '🔥', '😭', '👨‍👩‍👧', '🇮🇳', '1️⃣', '👍🏽']
+URLS = ['https://example.com/page', 'www.python.org', 'docs.google.com/document/d/1', 'http://bit.ly/abc']
+MEDIA = ['<Media omitted>', 'image omitted', 'sticker omitted', 'audio omitted', 'Missed voice call',
+         'Missed video call', 'This message was deleted']
+NAMES = ['Alice', 'Bob', 'Carol Singh', 'Dev', 'Emma', 'Farhan', 'Grace', 'Hiro', '+91 98765 43210', 'Ivan']
+
+# timestamp header of each dialect; {date} is filled with the day/month/year part
+STAMPS = {
+    'android': '{date}, %H:%M - ',
+    'android_12h': '{date}, %I:%M %p - ',
+    'ios': '[{date}, %H:%M:%S] ',
+    'ios_12h': '[{date}, %I:%M:%S %p] ',
+}
+
+def generate_chat(messages=10000, users=8, emoji=0.2, urls=0.05, media=0.05, multiline=0.05, mentions=0.03,
+                  dialect='android', month_first=False, short_year=False, seed=0):
+    # an export of the given size and content mix; the same arguments always give the same text
+    rng = random.Random(seed)
+    names = [NAMES[i % len(NAMES)] + ('' if i < len(NAMES) else ' ' + str(i // len(NAMES))) for i in range(users)]
+    date = ('%m/%d/' if month_first else '%d/%m/') + ('%y' if short_year else '%Y')
+    stamp = STAMPS[dialect].format(date=date)
+
+    moment = datetime(2021, 1, 1, 9, 0)
+    lines = []
+    for _ in range(messages):
+        # bursts of quick replies between longer pauses
+        pause = rng.expovariate(1 / 30) if rng.random() < 0.7 else rng.expovariate(1 / 7200)
+        moment += timedelta(seconds=int(pause))
+        user = rng.choice(names)
+        header = moment.strftime(stamp)
+        if rng.random() < 0.01:
+            lines.append(header + user + rng.choice([' added ' + rng.choice(names), ' left']) + '\n')
+            continue
+        if rng.random() < media:
+            body = rng.choice(MEDIA)
+        else:
+            words = rng.choices(WORDS, k=rng.randint(1, 15))
+            if rng.random() < emoji:
+                words.insert(rng.randrange(len(words) + 1), ''.join(rng.choices(EMOJIS, k=rng.randint(1, 3))))
+            if rng.random() < urls:
+                words.insert(rng.randrange(len(words) + 1), rng.choice(URLS))
+            if rng.random() < mentions:
+                words.insert(0, '@' + rng.choice(names).split()[0])
+            body = ' '.join(words)
+            if rng.random() < multiline:
+                body += '\n' + ' '.join(rng.choices(WORDS, k=rng.randint(1, 8)))
+        lines.append(header + user + ': ' + body + '\n')
+    return ''.join(lines)
+
+def check_date_order(messages=3000):
+    # regression check for the day/month detection: chats whose dates stay <= 12 far past the detection sample
+    # must get their order from the first date that settles it. A month/day chat that never settles it is
+    # ambiguous (read day first) and only has to parse. Returns the failed cases
+    failures = []
+    for dialect in sorted(STAMPS):
+        for month_first in (False, True):
+            for settled in (True, False):
+                stamp = STAMPS[dialect].format(date=('%m/%d/' if month_first else '%d/%m/') + '%Y')
+                start = datetime(2021, 1, 1, 9, 0)
+                moments = [start + timedelta(minutes=5 * i) for i in range(messages)]    # 3000 messages stay within January 1-12
+                if settled:
+                    moments.append(datetime(2021, 1, 13, 9, 0))
+                text = ''.join(moment.strftime(stamp) + f"Alice: message {i}\n" for i, moment in enumerate(moments))
+                try:
+                    dates = preprocessor.preprocess(io.BytesIO(text.encode('utf-8')), chunk_size=500)['date']
+                    ok = len(dates) == len(moments) and (not settled and month_first or dates.tolist() == moments)
+                except ValueError:
+                    ok = False
+                if not ok:
+                    failures.append((dialect, 'month first' if month_first else 'day first', 'settled' if settled else 'never settled'))
+    return failures
+
+def check_byte_order_mark():
+    # regression check for exports saved with a UTF-8 byte-order mark: the first message must not be lost,
+    # whether the export comes as text, bytes, a file or in chunks. Returns the failed cases
+    failures = []
+    moments = [datetime(2022, 12, 28, 22, 1), datetime(2022, 12, 28, 22, 2)]
+    for dialect in sorted(STAMPS):
+        stamp = STAMPS[dialect].format(date='%d/%m/%Y')
+        for messages in (1, 2):
+            text = '\ufeff' + ''.join(moment.strftime(stamp) + f"{name}: hi\n"
+                                       for moment, name in zip(moments[:messages], ['Alice', 'Bob']))
+            data = text.encode('utf-8')
+            sources = {'str': text, 'bytes': data, 'file': io.BytesIO(data), 'chunks': (data[i:i + 2] for i in range(0, len(data), 2))}
+            for kind, source in sources.items():
+                df = preprocessor.preprocess(source)
+                if df['user'].tolist() != ['Alice', 'Bob'][:messages] or df['date'].tolist() != moments[:messages]:
+                    failures.append((dialect, kind, f"{messages} message(s)"))
+    return failures
+
+def measure(func, args, repeat=1, memory=True):
+    # (result, best wall time in seconds, peak bytes allocated during one call or None)
+    seconds = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        seconds = min(seconds, time.perf_counter() - start)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            func(*args)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result, seconds, peak
+
+def run(sizes, repeat=1, memory=True, **chat_options):
+    records = []
+
+    def record(size, user, name, func, args):
+        result, seconds, peak = measure(func, args, repeat, memory)
+        records.append({'size': size, 'user': user, 'name': name, 'seconds': seconds, 'peak_bytes': peak})
+        print(f"{size:>9} {user:<10} {name:<28} {seconds:9.4f}s" + ('' if peak is None else f" {peak / 2 ** 20:9.1f} MB"),
+              flush=True)
+        return result
+
+    for size in sizes:
+        data = generate_chat(size, **chat_options).encode('utf-8')
+        df = record(size, '-', 'preprocess', lambda: preprocessor.preprocess(io.BytesIO(data), compact=True), ())
+        cube = record(size, '-', 'build_activity_cube', helper.build_activity_cube, (df,))
+        index = record(size, '-', 'search_index', search.SearchIndex, (df,))
+        record(size, '-', 'search', lambda: index.search('see you'), ())
+
+        shared = {}
+        def resolve(arg):
+            if isinstance(arg, sections.Shared):
+                if arg.name not in shared:
+                    shared[arg.name] = record(size, '-', arg.name, getattr(helper, arg.name), arg.args)
+                return shared[arg.name]
+            return arg
+
+        # Overall, and the most active participant for the per-user paths
+        busiest = helper._user_counts(df['user'][df['user'] != 'group_notification']).index[0]
+        for selected_user, label in (('Overall', 'Overall'), (busiest, 'user')):
+            record(size, label, 'chat_summary', helper.chat_summary, (selected_user, df, cube))
+            for title, renderer, calls in sections.section_jobs(selected_user, df, cube):
+                for name, args in calls:
+                    record(size, label, name, getattr(helper, name), [resolve(arg) for arg in args])
+    return records
+
+def compare(records, baseline, threshold):
+    # print new/old time per step; returns the steps slower than threshold (steps under a millisecond are noise)
+    old = {(r['size'], r['user'], r['name']): r for r in baseline['results']}
+    regressions = []
+    print(f"\n{'size':>9} {'user':<10} {'step':<28} {'before':>9} {'after':>9} {'ratio':>6}")
+    for r in records:
+        key = (r['size'], r['user'], r['name'])
+        if key not in old:
+            continue
+        before, after = old[key]['seconds'], r['seconds']
+        ratio = after / before if before else float('inf')
+        slower = ratio > threshold and max(before, after) >= 0.001
+        if slower:
+            regressions.append(key)
+        print(f"{r['size']:>9} {r['user']:<10} {r['name']:<28} {before:9.4f} {after:9.4f} {ratio:6.2f}" + (' REGRESSION' if slower else ''))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark preprocess and the analysis helpers on synthetic chats.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000], help="messages per synthetic chat")
+    parser.add_argument('--users', type=int, default=8)
+    parser.add_argument('--emoji', type=float, default=0.2, help="share of messages with emojis")
+    parser.add_argument('--urls', type=float, default=0.05, help="share of messages with a link")
+    parser.add_argument('--media', type=float, default=0.05, help="share of media/call/deleted messages")
+    parser.add_argument('--multiline', type=float, default=0.05, help="share of messages spanning two lines")
+    parser.add_argument('--mentions', type=float, default=0.03, help="share of messages starting with an @mention")
+    parser.add_argument('--dialect', choices=sorted(STAMPS), default='android')
+    parser.add_argument('--month-first', action='store_true', help="month/day/year dates")
+    parser.add_argument('--short-year', action='store_true', help="two-digit years")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=1, help="timed runs per step, the best one counts")
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc run that measures peak memory")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--compare', help="earlier results JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=1.25, help="slowdown ratio reported as a regression")
+    parser.add_argument('--generate', metavar='PATH', help="only write a synthetic export of --messages messages")
+    parser.add_argument('--messages', type=int, default=10000)
+    parser.add_argument('--check', action='store_true', help="only run the parser regression checks")
+    args = parser.parse_args(argv)
+
+    chat_options = dict(users=args.users, emoji=args.emoji, urls=args.urls, media=args.media, multiline=args.multiline,
+                        mentions=args.mentions, dialect=args.dialect, month_first=args.month_first,
+                        short_year=args.short_year, seed=args.seed)
+    if args.check:
+        failures = 0
+        for name, check in [("date order", check_date_order), ("byte-order mark", check_byte_order_mark)]:
+            failed = check()
+            for failure in failed:
+                print(name, "check failed:", *failure)
+            print(name, "checks:", "failed" if failed else "passed")
+            failures += len(failed)
+        return 1 if failures else 0
+    if args.generate:
+        with open(args.generate, 'w', encoding='utf-8', newline='') as out:
+            out.write(generate_chat(args.messages, **chat_options))
+        return 0
+
+    records = run(args.sizes, args.repeat, not args.no_memory, **chat_options)
+    if args.output:
+        meta = {'python': platform.python_version(), 'pandas': pd.__version__, 'machine': platform.machine(),
+                'date': datetime.now().isoformat(timespec='seconds'), 'chat': chat_options, 'repeat': args.repeat}
+        with open(args.output, 'w') as out:
+            json.dump({'meta': meta, 'results': records}, out, indent=1)
+    if args.compare:
+        with open(args.compare) as baseline:
+            if compare(records, json.load(baseline), args.threshold):
+                return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,121 @@
+import os
+import sys
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+STORE_FORMAT = 2    # bump when the parsed schema changes so files written by older versions are ignored
+
+def content_hash(data):
+    # hash of the raw export; accepts bytes, a memoryview or a BytesIO-like upload (hashed without copying)
+    if hasattr(data, 'getbuffer'):
+        with data.getbuffer() as view:
+            return hashlib.blake2b(view, digest_size=16).hexdigest()
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def sizeof(value):
+    # approximate memory held by a cached value
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(sizeof(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sizeof(item) for item in value.values())
+    if hasattr(value, 'nbytes'):    # numpy arrays, search indexes
+        return int(value.nbytes)
+    return sys.getsizeof(value)
+
+class LRUCache:
+    # least-recently-used cache bounded by the total size of its values rather than the number of entries;
+    # safe to share between Streamlit sessions (each session runs in its own thread)
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()    # key -> (value, size), oldest first
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def put(self, key, value):
+        size = sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self.total_bytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:    # would evict everything else and still not fit
+                return
+            self._entries[key] = (value, size)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                self.total_bytes -= self._entries.popitem(last=False)[1][1]
+
+    def get_or_compute(self, key, compute):
+        # compute runs outside the lock so a slow section doesn't block other sessions
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def items(self):
+        # snapshot of (key, value), least recently used first
+        with self._lock:
+            return [(key, value) for key, (value, size) in self._entries.items()]
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+class ChatStore:
+    # parsed chats on disk as Feather (Arrow IPC) files named by content hash; the typed and categorical
+    # columns round-trip unchanged and a reload memory-maps the file instead of parsing the export again
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    SUFFIX = '.v%d.feather' % STORE_FORMAT
+
+    def path(self, key):
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def load(self, key):
+        try:
+            return feather.read_table(self.path(key), memory_map=True).to_pandas()
+        except (OSError, ValueError):    # not stored yet, or a truncated/unreadable file: parse again
+            return None
+
+    def meta(self, key):
+        # the JSON-able dict saved with the frame (read from the file's schema only), or None
+        try:
+            with pa.memory_map(self.path(key)) as source:
+                metadata = pa.ipc.open_file(source).schema.metadata or {}
+        except (OSError, ValueError):
+            return None
+        return json.loads(metadata[b'messagemetrics']) if b'messagemetrics' in metadata else None
+
+    def keys(self):
+        return [name[:-len(self.SUFFIX)] for name in os.listdir(self.directory) if name.endswith(self.SUFFIX)]
+
+    def save(self, key, df, meta=None):
+        # written under a temporary name first so a reader never sees a half-written file
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if meta is not None:
+            table = table.replace_schema_metadata({**table.schema.metadata, b'messagemetrics': json.dumps(meta)})
+        path = self.path(key)
+        tmp = '%s.%d-%d.tmp' % (path, os.getpid(), threading.get_ident())
+        feather.write_feather(table, tmp, compression='uncompressed')
+        os.replace(tmp, path)
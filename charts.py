@@ -0,0 +1,27 @@
+import threading
+from contextlib import contextmanager
+from matplotlib.figure import Figure
+import streamlit as st
+
+# Charts are drawn on matplotlib Figures created outside pyplot, so pyplot never holds on to them (no
+# "too many open figures" and no memory growth across reruns). A figure is handed out from a pool per
+# figure size, cleared when the chart has been sent and reused by the next chart of that size.
+_pool = {}    # figsize -> figures not in use
+_lock = threading.Lock()    # sessions render in their own threads
+
+@contextmanager
+def figure(figsize=None):
+    # (figure, axes) for one chart; st.pyplot it inside the block, it is cleared and pooled on exit
+    with _lock:
+        free = _pool.get(figsize)
+        fig = free.pop() if free else Figure(figsize=figsize)
+    try:
+        yield fig, fig.subplots()
+    finally:
+        fig.clear()
+        with _lock:
+            _pool.setdefault(figsize, []).append(fig)
+
+def native():
+    # simple series are drawn with Streamlit's own charts when the sidebar option is on
+    return st.session_state.get('native_charts', False)
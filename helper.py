@@ -1,28 +1,141 @@
+import re
+import io
 import emoji
 from wordcloud import WordCloud, STOPWORDS
+from wordcloud.tokenization import score
 import matplotlib.pyplot as plt
 import seaborn as sns
 import pandas as pd
 import numpy as np
 from urlextract import URLExtract
-from collections import Counter
+from collections import Counter, namedtuple
+from functools import lru_cache
+from operator import itemgetter
+import preprocessor
 extract = URLExtract()
 
-def fetch_stats(selected_user,df):
+# URLExtract only reports a URL around a TLD match ('.' followed by the TLD) or 'localhost', so messages
+# without either can be skipped without changing the count
+LINK_CANDIDATE = r'\.[^\s.]|localhost'
+LINK_CACHE_SIZE = 200000    # distinct candidate messages whose link count is remembered
+
+@lru_cache(maxsize=LINK_CACHE_SIZE)
+def count_links(message):
+    return len(extract.find_urls(message))
+
+def _user_counts(users):
+    # value_counts that skips users with no rows, so a categorical user column counts like a plain one
+    counts = users.value_counts()
+    return counts[counts > 0]
+
+# Emoji extraction: every emoji has a non-ASCII character and only keycaps start with an ASCII one (their
+# base), so one cheap scan of the joined messages collects the non-ASCII runs (messages with a keycap get a
+# slower scan that keeps the base in front).
+# Each distinct run is then searched once for emoji runs, which are split into whole EMOJI_DATA sequences by
+# longest match, so ZWJ sequences, skin-tone modifiers, keycaps and flags count as one emoji. The emoji run
+# class lists BMP emoji characters exactly but only a few coarse blocks for astral ones; the lookup weeds
+# out anything the coarse blocks let through. ASCII keycap bases only start a run in front of U+20E3.
+def _emoji_run_pattern():
+    chars = {c for e in emoji.EMOJI_DATA for c in e if not c.isascii()}
+    astral = sorted(ord(c) for c in chars if ord(c) > 0xFFFF)
+    blocks = []
+    for code in astral:
+        if blocks and code - blocks[-1][1] <= 0x400:
+            blocks[-1][1] = code
+        else:
+            blocks.append([code, code])
+    char_class = ('[' + ''.join(re.escape(c) for c in sorted(c for c in chars if ord(c) <= 0xFFFF))
+                  + ''.join(re.escape(chr(lo)) + '-' + re.escape(chr(hi)) for lo, hi in blocks) + ']')
+    return '(?:[0-9#*]\uFE0F?\u20E3|' + char_class + ')+'
+
+EMOJI_RUN = re.compile(_emoji_run_pattern())
+EMOJI_MAX_LEN = max(len(e) for e in emoji.EMOJI_DATA)
+
+EMOJI_CANDIDATE = re.compile('[^\x00-\x7f][^\x00-\x7f]*')    # written so sre can skip ASCII text quickly
+KEYCAP_CANDIDATE = re.compile('[0-9#*]?[^\x00-\x7f]+')    # the same with a keycap base in front, for messages with U+20E3
+EMOJI_CHUNK = 20000    # messages joined into one string per emoji scan
+EMOJI_CACHE_SIZE = 100000    # distinct non-ASCII runs whose emojis are remembered
+
+def _split_emoji_run(run):
+    if run in emoji.EMOJI_DATA:    # the common case: the run is exactly one emoji
+        return [run]
+    found = []
+    i = 0
+    while i < len(run):
+        for size in range(min(EMOJI_MAX_LEN, len(run) - i), 0, -1):
+            if run[i:i + size] in emoji.EMOJI_DATA:
+                found.append(run[i:i + size])
+                i += size
+                break
+        else:
+            i += 1
+    return found
+
+@lru_cache(maxsize=EMOJI_CACHE_SIZE)
+def _run_emojis(candidate):
+    # the emojis in one non-ASCII run
+    return tuple(found for run in EMOJI_RUN.findall(candidate) for found in _split_emoji_run(run))
+
+def count_emojis(messages):
+    # Counter of the emojis in a column of messages; messages are joined a chunk at a time and a run that
+    # repeats (the same emoji sent again) is only split once
+    messages = messages.tolist() if hasattr(messages, 'tolist') else list(messages)
+    keycaps = [message for message in messages if '\u20e3' in message]
+    if keycaps:
+        messages = [message for message in messages if '\u20e3' not in message]
+    runs = Counter()
+    for pattern, group in ((EMOJI_CANDIDATE, messages), (KEYCAP_CANDIDATE, keycaps)):
+        for start in range(0, len(group), EMOJI_CHUNK):
+            runs.update(pattern.findall('\n'.join(group[start:start + EMOJI_CHUNK])))
+    counts = Counter()
+    for candidate, repeats in runs.items():
+        for found in _run_emojis(candidate):
+            counts[found] += repeats
+    return counts
+
+def _message_stats(messages):
+    # linear time: words from one loop over the messages, links only for messages that pass the cheap
+    # prefilter (repeated messages hit the count_links cache)
+    words = 0
+    for message in messages:
+        words += len(message.split())    #fetch no. of words shared
+    candidates = messages[messages.str.contains(LINK_CANDIDATE, flags=re.IGNORECASE)]
+    links = sum(map(count_links, candidates))    #fetch no. of links shared
+    return words, links
+
+def _of_type(df, kind):
+    # mask of the messages mentioning kind, from the msg_flags set at ingest (a message can mention several types)
+    return (df['msg_flags'].to_numpy() & preprocessor.MESSAGE_TYPE_BITS[kind]) != 0
+
+def fetch_stats(selected_user,df, emoji_counts=None):
+    # emoji_counts: the chat's per-user counts from build_emoji_counts, summed instead of scanning again
+    if emoji_counts is not None:
+        counted = emoji_counts.values() if selected_user == 'Overall' else [emoji_counts.get(selected_user, Counter())]
+        emojis = sum(sum(counts.values()) for counts in counted)    #fetch no. of emojis shared
     if selected_user != 'Overall':
         df = df[df['user'] == selected_user]
     num_messages = df.shape[0]
-    num_media_messages = df[df['message'] == '<Media omitted>\n'].shape[0]    #fetch no. of media messages
-
-    words = []
-    links=[]
-    for message in df['message']:
-        words.extend(message.split())   #fetch no. of words shared
-        links.extend(extract.find_urls(message))    #fetch no. of links shared
-        emojis = df['message'].apply(lambda x: len([c for c in x if c in emoji.EMOJI_DATA])).sum()   #fetch no. of emojis shared
-        stickers = df[df['message'].str.contains('sticker')].shape[0]    #fetch no. of stickers shared
-    
-    return num_messages, len(words), num_media_messages, len(links), emojis, stickers
+    words, links = _message_stats(df['message'])
+    if emoji_counts is None:
+        emojis = sum(count_emojis(df['message']).values())    #fetch no. of emojis shared
+    # Android's '<Media omitted>' rows only, as always counted; the other media types are flagged too
+    num_media_messages = int((df.loc[_of_type(df, 'media'), 'message'] == '<Media omitted>\n').sum())    #fetch no. of media messages
+    stickers = int(_of_type(df, 'sticker').sum())    #fetch no. of stickers shared
+
+    return num_messages, words, num_media_messages, links, emojis, stickers
+
+# what marks a first message as non-text; only one row is checked, so the exact list the dashboard has always
+# used is kept here (the sticker flag counts any message mentioning a sticker as one)
+NON_TEXT_PATTERNS = [
+    'voice message', 'audio', 'voice note', 'voice recording', 'voice clip', 'voice memo', 'voice file', 'voice msg',
+    '<media omitted>', 'image omitted', 'video omitted', 'document omitted', 'sticker omitted',
+    'voice call', 'video call', 'missed voice call', 'missed video call',
+    'gif omitted', 'location omitted', 'contact omitted', 'file omitted'
+]
+
+def _is_non_text(message):
+    message = message.lower()
+    return any(pattern in message for pattern in NON_TEXT_PATTERNS)
 
 def get_chat_age(df):
     # First, remove group notifications
@@ -38,14 +151,7 @@ def get_chat_age(df):
     first_message_user = first_message_row['user']
     
     # Check if the first message is a non-text message
-    non_text_patterns = [
-        'voice message', 'audio', 'voice note', 'voice recording', 'voice clip', 'voice memo', 'voice file', 'voice msg',
-        '<media omitted>', 'image omitted', 'video omitted', 'document omitted', 'sticker omitted',
-        'voice call', 'video call', 'missed voice call', 'missed video call',
-        'GIF omitted', 'location omitted', 'contact omitted', 'file omitted'
-    ]
-    
-    if any(pattern.lower() in first_message_text.lower() for pattern in non_text_patterns):
+    if _is_non_text(first_message_text):
         first_message_text = "It's a media message (voice message, call, image, video, etc.)"
     
     # Calculate chat age
@@ -94,14 +200,7 @@ def get_user_first_message(selected_user, df):
     first_message_text = first_message_row['message']
     
     # Check if the first message is a non-text message
-    non_text_patterns = [
-        'voice message', 'audio', 'voice note', 'voice recording', 'voice clip', 'voice memo', 'voice file', 'voice msg',
-        '<media omitted>', 'image omitted', 'video omitted', 'document omitted', 'sticker omitted',
-        'voice call', 'video call', 'missed voice call', 'missed video call',
-        'GIF omitted', 'location omitted', 'contact omitted', 'file omitted'
-    ]
-    
-    if any(pattern.lower() in first_message_text.lower() for pattern in non_text_patterns):
+    if _is_non_text(first_message_text):
         first_message_text = "It's a media message (voice message, call, image, video, etc.)"
     
     return {
@@ -114,52 +213,27 @@ def voice_message_analysis(selected_user, df):
     if selected_user != 'Overall':
         df = df[df['user'] == selected_user]
         
-    # Filter messages containing various voice message patterns
-    voice_patterns = [
-        'voice message',
-        'audio',
-        'voice note',
-        'voice recording',
-        'voice clip',
-        'voice memo',
-        'voice file',
-        'voice msg',
-        'voice msg.',
-        'voice msg:',
-        'voice message:',
-        'voice note:',
-        'voice recording:',
-        'voice clip:',
-        'voice memo:',
-        'voice file:'
-    ]
-    
-    # Create a pattern string for case-insensitive matching
-    pattern = '|'.join(voice_patterns)
-    voice_messages = df[df['message'].str.contains(pattern, case=False, na=False)]
+    # Voice messages were classified at ingest
+    voice_messages = df[_of_type(df, 'voice_message')]
     
     # Count voice messages per user
-    voice_counts = voice_messages['user'].value_counts().reset_index()
+    voice_counts = _user_counts(voice_messages['user']).reset_index()
     voice_counts.columns = ['User', 'Voice Message Count']
     
     return voice_counts
 
 def most_active_users(df):
-    x = df['user'].value_counts().head(5)    #fetch top 5 active users
-    df = round((df['user'].value_counts() / df.shape[0]) * 100, 2).reset_index().rename(columns={'user': 'name', 'count': 'percent'})
+    x = _user_counts(df['user']).head(5)    #fetch top 5 active users
+    df = round((_user_counts(df['user']) / df.shape[0]) * 100, 2).reset_index().rename(columns={'user': 'name', 'count': 'percent'})
     return x, df
 
 def call_analysis(selected_user, df):
     if selected_user != 'Overall':
         df = df[df['user'] == selected_user]
         
-    # Filter messages containing "voice call" or "video call"
-    voice_calls = df[df['message'].str.contains('voice call', case=False, na=False)]
-    video_calls = df[df['message'].str.contains('video call', case=False, na=False)]
-
     # Count the number of voice and video calls
-    voice_call_count = len(voice_calls)
-    video_call_count = len(video_calls)
+    voice_call_count = int(_of_type(df, 'voice_call').sum())
+    video_call_count = int(_of_type(df, 'video_call').sum())
 
     # If no calls are found, return a message
     if voice_call_count == 0 and video_call_count == 0:
@@ -173,97 +247,247 @@ def call_analysis(selected_user, df):
 
     return call_data, None
 
-def create_wordcloud(selected_user, df):    #wordcloud
-    if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
-    stopwords = set(STOPWORDS)
-    stopwords.update(['Media', 'omitted', 'https', 'added', 'left', 'group_notification'])  # Add words to exclude
-    wc = WordCloud(width=500, height=500, min_font_size=10, background_color='white', stopwords=stopwords)
-    wc = wc.generate(df['message'].str.cat(sep=' '))
+WORDCLOUD_STOPWORDS = frozenset(STOPWORDS | {'Media', 'omitted', 'https', 'added', 'left', 'group_notification'})  # Add words to exclude
+WORDCLOUD_SIZE = 500    # width and height of the wordcloud image in pixels
+WORDCLOUD_MAX_WORDS = 200    # terms placed in the cloud; the layout time grows with every extra term
+WORD_PATTERN = re.compile(r"\w[\w']*")    # WordCloud's default tokenizer
+COLLOCATION_THRESHOLD = 30    # WordCloud's default score above which a word pair is shown as one term
+
+def tokenize(message):
+    # WordCloud's token rules: a trailing 's is dropped, pure numbers are skipped
+    words = WORD_PATTERN.findall(message)
+    if "'" in message:
+        words = [word[:-2] if word[-2:] in ("'s", "'S") else word for word in words]
+    return [word for word in words if not word.isdigit()]
+
+def build_word_counts(df, stopwords=WORDCLOUD_STOPWORDS):
+    # (word Counter, word pair Counter) per user for the whole chat, stopwords already removed;
+    # pairs are adjacent non-stopwords inside one message, the candidates for collocations
+    # every distinct (user, message) is tokenized once and weighted by how often it was sent
+    stopwords = {word.lower() for word in stopwords}
+    word_counts = {}
+    for (user, message), repeats in Counter(zip(df['user'], df['message'])).items():
+        words = tokenize(message)
+        if not words:
+            continue
+        unigrams, bigrams = word_counts.setdefault(user, (Counter(), Counter()))
+        kept = [word.lower() not in stopwords for word in words]
+        for word, keep in zip(words, kept):
+            if keep:
+                unigrams[word] += repeats
+        for first, second, keep_first, keep_second in zip(words, words[1:], kept, kept[1:]):
+            if keep_first and keep_second:
+                bigrams[first + ' ' + second] += repeats
+    return word_counts
+
+def _fold_terms(counts):
+    # WordCloud's case and plural folding on counts: each term is shown in its most common casing and
+    # a plural is merged into its singular when both appear; returns (counts, lowercase -> shown form)
+    forms = {}
+    for term, count in counts.items():
+        forms.setdefault(term.lower(), {})[term] = count
+    plurals = []
+    for key in list(forms):
+        if key.endswith('s') and not key.endswith('ss') and key[:-1] in forms:
+            singular = forms[key[:-1]]
+            for term, count in forms.pop(key).items():
+                singular[term[:-1]] = singular.get(term[:-1], 0) + count
+            plurals.append(key)
+    folded, standard = {}, {}
+    for key, cases in forms.items():
+        shown = max(cases.items(), key=itemgetter(1))[0]
+        folded[shown] = sum(cases.values())
+        standard[key] = shown
+    for plural in plurals:
+        standard[plural] = standard[plural[:-1]]
+    return folded, standard
+
+def word_frequencies(unigrams, bigrams):
+    # the frequencies WordCloud.generate would have computed from the text these counts came from
+    n_words = sum(unigrams.values())
+    frequencies, standard = _fold_terms(unigrams)
+    word_totals = frequencies.copy()
+    for pair, count in _fold_terms(bigrams)[0].items():
+        first, second = pair.split(' ')
+        first, second = standard[first.lower()], standard[second.lower()]
+        if score(count, word_totals[first], word_totals[second], n_words) > COLLOCATION_THRESHOLD:
+            frequencies[first] -= count
+            frequencies[second] -= count
+            frequencies[pair] = count
+    return {term: count for term, count in frequencies.items() if count > 0}
+
+def create_wordcloud(selected_user, df, word_counts=None, size=WORDCLOUD_SIZE, max_words=WORDCLOUD_MAX_WORDS):    #wordcloud
+    if word_counts is None:
+        if selected_user != 'Overall':
+            df = df[df['user'] == selected_user]
+        word_counts = build_word_counts(df)
+    if selected_user == 'Overall':
+        unigrams, bigrams = Counter(), Counter()
+        for user_unigrams, user_bigrams in word_counts.values():
+            unigrams.update(user_unigrams)
+            bigrams.update(user_bigrams)
+    else:
+        unigrams, bigrams = word_counts.get(selected_user, (Counter(), Counter()))
+    wc = WordCloud(width=size, height=size, min_font_size=10, background_color='white', max_words=max_words)
+    wc = wc.generate_from_frequencies(word_frequencies(unigrams, bigrams))
     return wc
 
-def emoji_helper(selected_user, df):    #emoji analysis
-    if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
-    emojis = []
-    for message in df['message']:
-        emojis.extend([c for c in message if c in emoji.EMOJI_DATA])
+def wordcloud_image(selected_user, df, word_counts=None, size=WORDCLOUD_SIZE, max_words=WORDCLOUD_MAX_WORDS):
+    # the laid out cloud as PNG bytes: small to cache and shown as is, without drawing it again through matplotlib
+    image = io.BytesIO()
+    create_wordcloud(selected_user, df, word_counts, size, max_words).to_image().save(image, format='PNG')
+    return image.getvalue()
+
+def build_emoji_counts(df):
+    # emoji Counter per user for the whole chat (users without emojis are left out)
+    emoji_counts = {}
+    for user, messages in df.groupby('user', observed=True)['message']:
+        counts = count_emojis(messages)
+        if counts:
+            emoji_counts[user] = counts
+    return emoji_counts
+
+def emoji_helper(selected_user, df, emoji_counts=None):    #emoji analysis
+    if emoji_counts is None:
+        if selected_user != 'Overall':
+            df = df[df['user'] == selected_user]
+        emoji_counts = build_emoji_counts(df)
+    if selected_user == 'Overall':
+        emojis = Counter()
+        for user_counts in emoji_counts.values():
+            emojis.update(user_counts)
+    else:
+        emojis = emoji_counts.get(selected_user, Counter())
     if len(emojis) == 0:  # Check if no emojis are found
         return pd.DataFrame(columns=['Emoji', 'Count'])  # Return an empty DataFrame
     
-    emoji_df = pd.DataFrame(Counter(emojis).most_common(10))
+    emoji_df = pd.DataFrame(emojis.most_common(10))
     emoji_df.columns = ['Emoji', 'Count']
     return emoji_df
 
-def monthly_timeline(selected_user, df):    #monthly timeline
+ACTIVITY_KEYS = ['user', 'only_date', 'hour', 'year', 'month_num', 'month', 'day_name', 'period']
+
+def build_activity_cube(df):
+    # message counts per (user, date, hour); the other keys are functions of the date and hour and are
+    # carried along so the timeline/activity helpers can re-aggregate this table instead of the whole chat
+    cube = df.groupby(ACTIVITY_KEYS, observed=True).size().reset_index(name='count')
+    cube['user'] = cube['user'].astype(object)
+    return cube.set_index('user').sort_index(kind='stable')
+
+def update_activity_cube(cube, added, removed=None):
+    # the cube after rows were added to (and removed from) the chat, re-aggregated from the cube and the
+    # changed rows only
+    parts = [cube.reset_index(), build_activity_cube(added).reset_index()]
+    if removed is not None:
+        removed = build_activity_cube(removed).reset_index()
+        removed['count'] = -removed['count']
+        parts.append(removed)
+    counts = pd.concat(parts, ignore_index=True).groupby(ACTIVITY_KEYS, observed=True)['count'].sum()
+    return counts[counts > 0].reset_index().set_index('user').sort_index(kind='stable')
+
+def update_user_counts(counts, added, removed=None):
+    # per-user counts (as from build_emoji_counts/build_word_counts) after rows were added to (and removed
+    # from) the chat; added/removed are the same builder's counts for those rows. A user's value is a
+    # Counter or a tuple of Counters
+    def merge(old, new, sign):
+        if isinstance(old, tuple):
+            return tuple(merge(*parts, sign) for parts in zip(old, new))
+        merged = old.copy()
+        if sign > 0:
+            merged.update(new)
+        else:
+            merged.subtract(new)
+        return +merged    # drops terms that fell to zero
+
+    counts = dict(counts)
+    for change, sign in ((added, 1), (removed or {}, -1)):
+        for user, value in change.items():
+            if user in counts:
+                counts[user] = merge(counts[user], value, sign)
+            elif sign > 0:
+                counts[user] = value
+    return counts
+
+def _activity(selected_user, df, cube=None):
+    # the selected user's rows of the activity cube, built from df when no precomputed cube is passed
+    if cube is None:
+        if selected_user != 'Overall':
+            df = df[df['user'] == selected_user]
+        return build_activity_cube(df)
     if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
-    monthly_timeline = df.groupby(['year', 'month_num', 'month']).count()['message'].reset_index()
-    time = []
-    for i in range(monthly_timeline.shape[0]):
-        time.append(monthly_timeline['month'][i] + '-' + str(monthly_timeline['year'][i]))
-    monthly_timeline['time'] = time
+        return cube.loc[selected_user:selected_user]    # sorted index: binary search instead of a row scan
+    return cube
+
+def chat_summary(selected_user, df, cube=None):
+    # headline numbers read off the activity cube, cheap enough to show before any section is computed
+    activity = _activity(selected_user, df, cube)
+    if activity.empty:
+        return {'messages': 0, 'participants': 0, 'active_days': 0, 'first_date': '-', 'last_date': '-'}
+    return {
+        'messages': int(activity['count'].sum()),
+        'participants': int(activity.index[activity.index != 'group_notification'].nunique()),
+        'active_days': int(activity['only_date'].nunique()),
+        'first_date': pd.Timestamp(activity['only_date'].min()).strftime('%d %B %Y'),
+        'last_date': pd.Timestamp(activity['only_date'].max()).strftime('%d %B %Y')
+    }
+
+def monthly_timeline(selected_user, df, cube=None):    #monthly timeline
+    activity = _activity(selected_user, df, cube)
+    monthly_timeline = activity.groupby(['year', 'month_num', 'month'], observed=True)['count'].sum().reset_index(name='message')
+    monthly_timeline['time'] = monthly_timeline['month'].astype(str) + '-' + monthly_timeline['year'].astype(str)
     return monthly_timeline
 
-def daily_timeline(selected_user, df):
-    if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
-    daily_timeline = df.groupby('only_date').size().reset_index(name='message')  # Count messages per day
+def daily_timeline(selected_user, df, cube=None):
+    activity = _activity(selected_user, df, cube)
+    daily_timeline = activity.groupby('only_date')['count'].sum().reset_index(name='message')  # Count messages per day
     return daily_timeline
 
-def week_activity_map(selected_user, df):
-    if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
-    return df['day_name'].value_counts()  # Count messages per day of the week
+def week_activity_map(selected_user, df, cube=None):
+    activity = _activity(selected_user, df, cube)
+    return activity.groupby('day_name', observed=True)['count'].sum().sort_values(ascending=False)  # Count messages per day of the week
 
-def month_activity_map(selected_user, df):
-    if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
-    return df['month'].value_counts()  # Count messages per month
+def month_activity_map(selected_user, df, cube=None):
+    activity = _activity(selected_user, df, cube)
+    return activity.groupby('month', observed=True)['count'].sum().sort_values(ascending=False)  # Count messages per month
 
-def activity_heatmap(selected_user, df):
-    if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
-    heatmap = df.pivot_table(index='day_name', columns='period', values='message', aggfunc='count').fillna(0)
+def activity_heatmap(selected_user, df, cube=None):
+    activity = _activity(selected_user, df, cube)
+    heatmap = activity.pivot_table(index='day_name', columns='period', values='count', aggfunc='sum', observed=True).fillna(0)
     return heatmap  # Create a pivot table for heatmap
 
-def response_time_analysis(selected_user, df):
-    if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
-        
-    df = df[df['user'] != 'group_notification']
-
-    # Calculate time difference between consecutive messages
-    df['time_diff'] = df['date'].diff().dt.total_seconds()
-
-    # Shift the 'user' column to align with the time difference (who replied to whom)
-    df['prev_user'] = df['user'].shift()
-
-    # Filter rows where the user is replying to someone else
-    df = df[df['user'] != df['prev_user']]
-
-    # Remove any rows with NaN values in time_diff
-    df = df.dropna(subset=['time_diff'])
+RESPONSE_IDLE_SECONDS = 6 * 3600    # a reply later than this ends a silence, it isn't counted as a response time
+RESPONSE_BUCKETS = [0, 60, 300, 900, 3600, 6 * 3600, np.inf]    # histogram edges in seconds
+RESPONSE_BUCKET_LABELS = ['< 1 min', '1-5 min', '5-15 min', '15-60 min', '1-6 h', '> 6 h']
+RESPONSE_COLUMNS = ['user', 'responses', 'avg_response_time', 'median_response_time', 'p90_response_time']
 
-    # If no valid response times found
-    if df.empty:
-        return pd.DataFrame(columns=['user', 'avg_response_time']), None
-
-    # Group by user and calculate average response time
-    response_times = df.groupby('user')['time_diff'].mean().reset_index()
-    response_times.rename(columns={'time_diff': 'avg_response_time'}, inplace=True)
-
-    # If no valid response times after grouping
-    if response_times.empty:
-        return pd.DataFrame(columns=['user', 'avg_response_time']), None
-
-    # Find the fastest responder only if we have valid data
-    try:
-        fastest_responder = response_times.loc[response_times['avg_response_time'].idxmin()]
-    except:
-        return response_times, None
-
-    return response_times, fastest_responder
+def response_time_analysis(selected_user, df, idle_seconds=RESPONSE_IDLE_SECONDS):
+    # response_time was computed at ingest over the whole chat: the wait since someone else's message, so a
+    # selected user's numbers are their replies to others, not the gaps between their own messages
+    replies = df[['user', 'response_time']].dropna()
+    if selected_user != 'Overall':
+        replies = replies[replies['user'] == selected_user]
+    if idle_seconds is not None:
+        replies = replies[replies['response_time'] <= idle_seconds]
+
+    if replies.empty:
+        return pd.DataFrame(columns=RESPONSE_COLUMNS), None, pd.DataFrame(columns=RESPONSE_BUCKET_LABELS)
+
+    # every statistic from the same grouping of the reply rows
+    grouped = replies.groupby('user', observed=True)['response_time']
+    quantiles = grouped.quantile([0.5, 0.9]).unstack()
+    response_times = pd.DataFrame({
+        'responses': grouped.size(),
+        'avg_response_time': grouped.mean(),
+        'median_response_time': quantiles[0.5],
+        'p90_response_time': quantiles[0.9],
+    }).rename_axis('user').reset_index()
+
+    buckets = pd.cut(replies['response_time'], RESPONSE_BUCKETS, labels=RESPONSE_BUCKET_LABELS, right=False)
+    histogram = replies.groupby(['user', buckets], observed=True).size().unstack(fill_value=0)
+    histogram = histogram.reindex(columns=RESPONSE_BUCKET_LABELS, fill_value=0).rename_axis(columns=None)
+
+    fastest_responder = response_times.loc[response_times['avg_response_time'].idxmin()]
+    return response_times, fastest_responder, histogram
 
 def first_message_of_day(selected_user, df):
     if selected_user != 'Overall':
@@ -278,37 +502,100 @@ def first_message_of_day(selected_user, df):
     first_messages = df.groupby('only_date').first().reset_index()
 
     # Count the occurrences of each user in the first messages
-    first_message_counts = first_messages['user'].value_counts().reset_index()
+    first_message_counts = _user_counts(first_messages['user']).reset_index()
     first_message_counts.columns = ['user', 'first_message_count']
 
     return first_message_counts
 
-def late_night_activity(selected_user, df):
-    if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
-        
+def late_night_activity(selected_user, df, cube=None):
+    activity = _activity(selected_user, df, cube)
+
     # Remove group notifications
-    df = df[df['user'] != 'group_notification']
+    activity = activity[activity.index != 'group_notification']
     # Filter messages sent between 12 AM and 3 AM
-    late_night_messages = df[(df['hour'] >= 0) & (df['hour'] < 3)]
+    late_night_messages = activity[(activity['hour'] >= 0) & (activity['hour'] < 3)]
 
     # Count the number of messages sent by each user during this time
-    late_night_counts = late_night_messages['user'].value_counts().reset_index()
+    late_night_counts = late_night_messages.groupby(level='user')['count'].sum().sort_values(ascending=False).reset_index()
     late_night_counts.columns = ['user', 'late_night_message_count']
 
     return late_night_counts
 
-def longest_streaks(selected_user, df):
-    if selected_user != 'Overall':
-        df = df[df['user'] == selected_user]
-        
+def longest_streaks(selected_user, df, cube=None):
+    activity = _activity(selected_user, df, cube)
+
     # Group messages by date and count the number of messages for each day
-    daily_activity = df.groupby('only_date').size().reset_index(name='message_count')
+    daily_activity = activity.groupby('only_date')['count'].sum()
+    daily_activity = daily_activity[daily_activity > 0].sort_index()
+
+    # one pass over the active days: a day that doesn't follow the previous one starts a new streak
+    days = pd.Series(pd.to_datetime(daily_activity.index))
+    streak = (days.diff() != pd.Timedelta(days=1)).cumsum()
+    streaks = pd.DataFrame({'streak': streak.to_numpy(), 'date': days.dt.date.to_numpy(),
+                            'message_count': daily_activity.to_numpy()})
+    streaks = streaks.groupby('streak').agg(start=('date', 'first'), end=('date', 'last'),
+                                            days=('date', 'size'), message_count=('message_count', 'sum'))
+
+    # Longest streaks first, the busier one on a tie
+    return streaks.sort_values(['days', 'message_count'], ascending=False).head(10).reset_index(drop=True)
+
+SESSION_GAP_SECONDS = 3600    # a silence longer than this ends a conversation
+Sessions = namedtuple('Sessions', ['table', 'members'])
+SESSION_COLUMNS = ['start', 'end', 'duration', 'messages', 'participants', 'initiator']
+
+def build_sessions(df, gap_seconds=SESSION_GAP_SECONDS):
+    # splits the timeline into conversations in one pass: a message more than gap_seconds after the previous one
+    # starts a new session. table is indexed by session number (start, end, duration in seconds, messages,
+    # participants, initiator); members has a row per (session, user) with the user's message count, so the
+    # sessions of a user are a lookup instead of a scan of the chat
+    messages = df[df['user'] != 'group_notification']
+    if messages.empty:    # e.g. a new group with nothing but notifications yet
+        table = pd.DataFrame(columns=SESSION_COLUMNS, index=pd.RangeIndex(0, name='session'))
+        return Sessions(table, pd.DataFrame(columns=['session', 'user', 'messages']))
+    dates = messages['date']
+    session = np.zeros(len(messages), dtype=np.int64)
+    session[1:] = np.cumsum(np.diff(dates.to_numpy()) > np.timedelta64(int(gap_seconds), 's'))
+
+    starts = np.flatnonzero(np.diff(session, prepend=-1))
+    ends = np.append(starts[1:], len(session)) - 1
+    table = pd.DataFrame({
+        'start': dates.iloc[starts].to_numpy(),
+        'end': dates.iloc[ends].to_numpy(),
+        'messages': ends - starts + 1,
+        'initiator': messages['user'].iloc[starts].array,
+    }, index=pd.RangeIndex(len(starts), name='session'))
+    table.insert(2, 'duration', (table['end'] - table['start']).dt.total_seconds())
+
+    members = pd.DataFrame({'session': session, 'user': messages['user'].array})
+    members = members.groupby(['session', 'user'], observed=True).size().reset_index(name='messages')
+    table.insert(4, 'participants', members.groupby('session').size().reindex(table.index, fill_value=0))
+    return Sessions(table, members)
+
+def conversation_analysis(selected_user, df, sessions=None, gap_seconds=SESSION_GAP_SECONDS):
+    # (summary, conversation starters, longest conversations) over the sessions the selected user took part in
+    if sessions is None:
+        sessions = build_sessions(df, gap_seconds)
+    table, members = sessions
+    if selected_user != 'Overall':
+        table = table.loc[members.loc[members['user'] == selected_user, 'session']]
 
-    # Sort by message count in descending order
-    top_days = daily_activity.sort_values(by='message_count', ascending=False).head(10)
+    if table.empty:
+        return None, pd.DataFrame(columns=['user', 'conversations_started']), pd.DataFrame(columns=table.columns)
+
+    summary = {
+        'conversations': len(table),
+        'avg_messages': round(table['messages'].mean(), 1),
+        'median_duration_minutes': round(table['duration'].median() / 60, 1),
+        'avg_participants': round(table['participants'].mean(), 1),
+    }
+    if selected_user != 'Overall':
+        summary['started_by_user'] = int((table['initiator'] == selected_user).sum())
 
-    return top_days
+    starters = _user_counts(table['initiator']).reset_index()
+    starters.columns = ['user', 'conversations_started']
+    longest = table.sort_values(['messages', 'duration'], ascending=False, kind='stable').head(10).reset_index()
+    longest['initiator'] = longest['initiator'].astype(object)
+    return summary, starters, longest
 
 def text_length_analysis(selected_user, df):
     if selected_user != 'Overall':
@@ -322,7 +609,7 @@ def text_length_analysis(selected_user, df):
     
     # Calculate average message length for each user
     if selected_user == 'Overall':
-        avg_length = df.groupby('user')['message'].apply(
+        avg_length = df.groupby('user', observed=True)['message'].apply(
             lambda x: sum(len(msg) for msg in x) / len(x)
         ).reset_index()
         avg_length.columns = ['User', 'Average Message Length']
@@ -339,15 +626,15 @@ def analyze_deleted_messages(selected_user, df):
     if selected_user != 'Overall':
         df = df[df['user'] == selected_user]
         
-    deleted_messages = df[df['message'].str.contains('This message was deleted', case=False, na=False)]
+    deleted_messages = df[_of_type(df, 'deleted')]
     
     # Count deletions per user
-    deletion_counts = deleted_messages['user'].value_counts().reset_index()
+    deletion_counts = _user_counts(deleted_messages['user']).reset_index()
     deletion_counts.columns = ['User', 'Deleted Messages']
     
     # Calculate percentage of total messages
-    total_messages = df.groupby('user')['message'].count()
-    deletion_percentages = (deleted_messages['user'].value_counts() / total_messages * 100).round(2)
+    total_messages = df.groupby('user', observed=True)['message'].count()
+    deletion_percentages = (_user_counts(deleted_messages['user']) / total_messages * 100).round(2)
     deletion_counts['Deletion Rate (%)'] = deletion_counts['User'].map(deletion_percentages)
     
     return deletion_counts
@@ -361,42 +648,29 @@ def analyze_group_dynamics(selected_user, df):
     if unique_users <= 2:
         return None, None, "This is not a group chat"
 
-    # Analyze mentions (@username)
-    mentions = []
-    mention_by = []
-    for _, row in df.iterrows():
-        message = row['message']
-        sender = row['user']
-        # Find all @mentions in the message
-        if '@' in message:
-            mentioned_users = [word.strip('@') for word in message.split() if word.startswith('@')]
-            for mentioned in mentioned_users:
-                mentions.append(mentioned)
-                mention_by.append(sender)
+    # Analyze mentions (@username): every whitespace-separated word starting with '@'
+    tagged = df[df['message'].str.contains('@', regex=False)]
+    mentions = tagged['message'].str.extractall(r'(?<!\S)@(\S*)')[0]
 
     # Create mentions DataFrame
     mentions_df = pd.DataFrame({
-        'Mentioned_by': mention_by,
-        'Mentioned_user': mentions
+        'Mentioned_by': tagged.loc[mentions.index.get_level_values(0), 'user'].astype(object).to_numpy(),
+        'Mentioned_user': mentions.str.strip('@').to_numpy()
     })
     mentions_summary = mentions_df.groupby('Mentioned_by').size().reset_index(name='Mention_count')
     mentions_summary = mentions_summary.sort_values('Mention_count', ascending=False)
 
-    # Analyze reply patterns
-    replies = []
-    for i in range(1, len(df)):
-        current_user = df.iloc[i]['user']
-        prev_user = df.iloc[i-1]['user']
-        if current_user != prev_user and current_user != 'group_notification' and prev_user != 'group_notification':
-            replies.append({
-                'From': current_user,
-                'To': prev_user
-            })
+    # Analyze reply patterns: a message answers the previous one when the sender changes
+    users = df['user']
+    prev_users = users.shift()
+    is_reply = (prev_users.notna() & (users != prev_users)
+                & (users != 'group_notification') & (prev_users != 'group_notification'))
 
     # Create reply patterns DataFrame
-    replies_df = pd.DataFrame(replies)
-    if not replies_df.empty:
-        reply_summary = replies_df.groupby(['From', 'To']).size().reset_index(name='Reply_count')
+    if is_reply.any():
+        replies_df = pd.DataFrame({'From': users[is_reply], 'To': prev_users[is_reply]})
+        reply_summary = replies_df.groupby(['From', 'To'], observed=True).size().reset_index(name='Reply_count')
+        reply_summary[['From', 'To']] = reply_summary[['From', 'To']].astype(object)
         reply_summary = reply_summary.sort_values('Reply_count', ascending=False)
     else:
         reply_summary = pd.DataFrame(columns=['From', 'To', 'Reply_count'])
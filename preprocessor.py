@@ -1,54 +1,372 @@
 import re
+import io
+import codecs
+import hashlib
+import itertools
+from collections import namedtuple
+import numpy as np
 import pandas as pd
+from pandas.api.types import union_categoricals
 
-def preprocess(data):
-    pattern = r'\d{1,2}/\d{1,2}/\d{2,4},\s\d{1,2}:\d{2}\s-\s'
+# An export dialect is the shape of the timestamp header that opens every message. Its pattern
+# captures the two date fields (day/month order is resolved from the data), the year, the time
+# and, for 12-hour clocks, the AM/PM marker.
+Dialect = namedtuple('Dialect', ['name', 'pattern', 'time_format'])
+DIALECTS = {}
 
-    messages = re.split(pattern, data)[1:]
-    dates = re.findall(pattern, data)
+def register_dialect(name, pattern, time_format):
+    DIALECTS[name] = Dialect(name, re.compile(pattern), time_format)
 
-    df = pd.DataFrame({'user_message': messages, 'message_date': dates})
-    # convert message_date type
-    df['message_date'] = pd.to_datetime(df['message_date'], format='%d/%m/%Y, %H:%M - ')
+_DATE = r'(?P<first>\d{1,2})[/.-](?P<second>\d{1,2})[/.-](?P<year>\d{2,4}),\s'
+_AMPM = r'\s?(?P<ampm>[AaPp]\.?[Mm]\.?)'
 
-    df.rename(columns={'message_date': 'date'}, inplace=True)
+register_dialect('android', _DATE + r'(?P<time>\d{1,2}:\d{2})\s-\s', '%H:%M')    # 28/12/2022, 22:01 - 
+register_dialect('android_12h', _DATE + r'(?P<time>\d{1,2}:\d{2})' + _AMPM + r'\s-\s', '%I:%M %p')    # 12/28/22, 10:01 PM - 
+register_dialect('ios', r'\u200e?\[' + _DATE + r'(?P<time>\d{1,2}:\d{2}:\d{2})\]\s', '%H:%M:%S')    # [28/12/2022, 22:01:05] 
+register_dialect('ios_12h', r'\u200e?\[' + _DATE + r'(?P<time>\d{1,2}:\d{2}:\d{2})' + _AMPM + r'\]\s', '%I:%M:%S %p')    # [12/28/22, 10:01:05 PM] 
 
-    users = []
-    messages = []
-    for message in df['user_message']:
-        entry = re.split(r'([\w\W]+?):\s', message)
-        if entry[1:]:  # user name
-            users.append(entry[1])
-            messages.append(" ".join(entry[2:]))
-        else:
-            users.append('group_notification')
-            messages.append(entry[0])
-
-    df['user'] = users
-    df['message'] = messages
-    df.drop(columns=['user_message'], inplace=True)
-
-    df['only_date'] = df['date'].dt.date
-    df['year'] = df['date'].dt.year
-    df['month_num'] = df['date'].dt.month
-    df['month'] = df['date'].dt.month_name()
-    df['day'] = df['date'].dt.day
-    df['day_name'] = df['date'].dt.day_name()
-    df['hour'] = df['date'].dt.hour
-    df['minute'] = df['date'].dt.minute
-
-    period=[]
-    for hour in df[['day_name', 'hour']]['hour']:
-        if hour == 23 or hour == 0:
-            period.append(str(hour) + "-"  + str('00'))
-        elif hour == 0:
-            period.append(str('00') + "-" + str(hour + 1))
+DEFAULT_DIALECT = 'android'
+SAMPLE_SIZE = 32 * 1024    # characters read from the top of the export to pick the dialect
+
+USER_PATTERN = re.compile(r'(.+?):\s')    # "<user>: " at the start of a message
+
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June',
+          'July', 'August', 'September', 'October', 'November', 'December']
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+PERIODS = ['00-1'] + [str(hour) + "-" + str(hour + 1) for hour in range(1, 23)] + ['23-00']    # indexed by hour
+
+# message-type keywords, matched case-insensitively anywhere in the message ('sticker' case-sensitively, as it was
+# always counted). msg_type is the type of a message's leftmost keyword (longest keyword on a tie) or 'text' when
+# none matches; msg_flags has the bit MESSAGE_TYPE_BITS[type] set for every type the message mentions, so a helper
+# counting one type finds every message its own scan used to
+MESSAGE_TYPES = ['text', 'media', 'sticker', 'voice_message', 'voice_call', 'video_call', 'deleted']
+MESSAGE_TYPE_KEYWORDS = {
+    'media': ['<media omitted>', 'image omitted', 'video omitted', 'document omitted', 'gif omitted',
+              'location omitted', 'contact omitted', 'file omitted'],
+    'sticker': ['sticker'],
+    'voice_message': ['voice message', 'audio', 'voice note', 'voice recording', 'voice clip', 'voice memo',
+                      'voice file', 'voice msg'],
+    'voice_call': ['voice call'],
+    'video_call': ['video call'],
+    'deleted': ['this message was deleted'],
+}
+CASE_SENSITIVE_KEYWORDS = {'sticker'}
+MESSAGE_TYPE_BITS = {kind: 1 << code for code, kind in enumerate(MESSAGE_TYPES) if code}
+_KEYWORD_CODES = {keyword: MESSAGE_TYPES.index(kind) for kind, keywords in MESSAGE_TYPE_KEYWORDS.items() for keyword in keywords}
+MESSAGE_TYPE_PATTERN = '(' + '|'.join(re.escape(keyword) for keyword in sorted(_KEYWORD_CODES, key=len, reverse=True)) + ')'
+
+CHUNK_SIZE = 50000    # parsed rows held as python lists before being flushed into a DataFrame chunk
+
+# How far an export has been ingested: its size and digest, where its last message starts (byte offset in the
+# export, row in the sorted frame) and the dialect and date format it was parsed with. A later export of the
+# same chat starts with these bytes, so only the part from that last message on has to be parsed.
+Ingested = namedtuple('Ingested', ['size', 'digest', 'tail_offset', 'tail_row', 'dialect', 'date_format'])
+
+# column dtypes of the compact schema (preprocess(..., compact=True)); only_date becomes a day-resolution datetime64
+COMPACT_DTYPES = {
+    'year': 'int16',
+    'month_num': 'int8',
+    'day': 'int8',
+    'hour': 'int8',
+    'minute': 'int8',
+}
+
+def _iter_lines(source):
+    # yield text lines (line endings kept) from a str, bytes, a text/binary file object or an iterator of str/bytes chunks;
+    # a byte-order mark in front of the export is dropped, or the first header would not match
+    if isinstance(source, str):
+        yield from io.StringIO(source[1:] if source.startswith('\ufeff') else source, newline='')
+        return
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    if hasattr(source, 'read'):
+        if isinstance(source.read(0), bytes):
+            text = io.TextIOWrapper(source, encoding='utf-8-sig', newline='')
+            try:
+                yield from text
+            finally:
+                text.detach()    # don't let the wrapper close the caller's file
         else:
-            period.append(str(hour) + "-" + str(hour + 1))
-    df['period'] = period
+            yield from source
+        return
+
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    pending = ''
+    for chunk in source:
+        if isinstance(chunk, (bytes, bytearray)):
+            chunk = decoder.decode(chunk)
+        pending += chunk
+        start = 0
+        end = pending.find('\n')
+        while end != -1:
+            yield pending[start:end + 1]
+            start = end + 1
+            end = pending.find('\n', start)
+        pending = pending[start:]
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+def _day_first(first, second):
+    # whether a date is day/month (True) or month/day (False); None while both fields are <= 12
+    if int(first) > 12:
+        return True
+    if int(second) > 12:
+        return False
+    return None
+
+def _with_order(date_format, day_first):
+    # the date format with its day/month order set
+    return ('%d/%m/' if day_first else '%m/%d/') + date_format[len('%d/%m/'):]
+
+def detect_dialect(lines, dialect=None):
+    # pick the registered dialect whose header matches most of the sampled lines, then read the
+    # day/month order and year width off the sampled headers; returns (dialect, to_datetime format)
+    candidates = [DIALECTS[dialect]] if dialect is not None else DIALECTS.values()
+    best, headers = DIALECTS[DEFAULT_DIALECT], []
+    for candidate in candidates:
+        matches = [match for match in map(candidate.pattern.match, lines) if match]
+        if len(matches) > len(headers) or dialect is not None:
+            best, headers = candidate, matches
+
+    day_first = True
+    for match in headers:
+        order = _day_first(match['first'], match['second'])
+        if order is not None:
+            day_first = order
+            break
+    year = '%y' if headers and len(headers[0]['year']) == 2 else '%Y'
+
+    return best, _with_order('%d/%m/' + year + ' ' + best.time_format, day_first)
+
+def _stamp(match, twelve_hour):
+    # normalise a header to 'first/second/year time[ AM|PM]' so one fixed format parses every row
+    stamp = match['first'] + '/' + match['second'] + '/' + match['year'] + ' ' + match['time']
+    if twelve_hour:
+        stamp += ' ' + match['ampm'].replace('.', '').upper()
+    return stamp
+
+def _iter_messages(lines, dialect):
+    # a line starting with a timestamp opens a new message, any other line continues the current one
+    header = dialect.pattern.match
+    twelve_hour = 'ampm' in dialect.pattern.groupindex
+    date = None
+    body = []
+    for line in lines:
+        match = header(line)
+        if match:
+            if date is not None:
+                yield date, ''.join(body)
+            date = _stamp(match, twelve_hour)
+            body = [line[match.end():]]
+        elif date is not None:
+            body.append(line)
+    if date is not None:
+        yield date, ''.join(body)
+
+def _split_user(message):
+    entry = USER_PATTERN.match(message)
+    if entry:  # user name
+        return entry.group(1), message[entry.end():]
+    return 'group_notification', message
+
+def _build_chunk(dates, users, messages, date_format, compact=False):
+    # without a date format the dates stay text, to be converted once their day/month order is known
+    return pd.DataFrame({
+        'date': pd.to_datetime(dates, format=date_format) if date_format else pd.Series(dates, dtype=object),
+        'user': pd.Categorical(users) if compact else pd.Series(users, dtype=object),
+        'message': pd.Series(messages, dtype=object)    # string columns even when the chunk is empty
+    })
+
+def _add_time_columns(df, compact=False):
+    # every calendar field is derived from one datetime64 array with integer arithmetic,
+    # and the text fields are categoricals built straight from integer codes (no per-row strings)
+    stamps = df['date'].values.astype('datetime64[m]')
+    days = stamps.astype('datetime64[D]')
+    months = days.astype('datetime64[M]')
+    years = months.astype('datetime64[Y]')
+
+    month_num = (months.astype('int64') - years.astype('int64') * 12).astype('int32')
+    hour = ((stamps - days).astype('int64') // 60).astype('int32')
+
+    df['only_date'] = days.astype(object)
+    df['year'] = (years.astype('int64') + 1970).astype('int32')
+    df['month_num'] = month_num + 1
+    df['month'] = pd.Categorical.from_codes(month_num, categories=MONTHS)
+    df['day'] = ((days - months).astype('int64') + 1).astype('int32')
+    df['day_name'] = pd.Categorical.from_codes((days.astype('int64') + 3) % 7, categories=DAYS)    # 1970-01-01 was a Thursday
+    df['hour'] = hour
+    df['minute'] = ((stamps - days).astype('int64') % 60).astype('int32')
+    df['period'] = pd.Categorical.from_codes(hour, categories=PERIODS)
 
-    df = df.sort_values(by='date').reset_index(drop=True)
+    if compact:
+        df['only_date'] = days
+        for column, dtype in COMPACT_DTYPES.items():
+            df[column] = df[column].astype(dtype)
 
+def _add_message_type(df):
+    # one scan per message over all keywords together, on the lower-cased text (several times faster than a
+    # case-insensitive pattern); its matches give the msg_type categorical (first keyword) and the msg_flags
+    # bitmask (every keyword). A case-sensitive keyword only counts where the message has it as written
+    found = df['message'].str.lower().str.findall(MESSAGE_TYPE_PATTERN)
+    rows = np.repeat(np.arange(len(df)), found.str.len().to_numpy(dtype='int64'))
+    keywords = np.array(list(itertools.chain.from_iterable(found)), dtype=object)
+    codes = np.array([_KEYWORD_CODES[keyword] for keyword in keywords], dtype='int8')
+    for keyword in CASE_SENSITIVE_KEYWORDS:
+        matched = np.flatnonzero(keywords == keyword)
+        if len(matched):
+            written = df['message'].iloc[rows[matched]].str.contains(keyword, regex=False).to_numpy()
+            codes[matched[~written]] = 0
+    rows, codes = rows[codes > 0], codes[codes > 0]
+
+    first = np.zeros(len(df), dtype='int8')
+    first[rows[::-1]] = codes[::-1]    # the first match of a row is written last
+    flags = np.zeros(len(df), dtype='uint8')
+    np.bitwise_or.at(flags, rows, np.left_shift(1, codes).astype('uint8'))
+    df['msg_type'] = pd.Categorical.from_codes(first, categories=MESSAGE_TYPES)
+    df['msg_flags'] = flags
+
+def _add_response_time(df):
+    # seconds since the previous message when that came from someone else (a reply), NaN otherwise;
+    # taken over the whole sorted chat with group notifications skipped, so it needs the final row order
+    response_time = np.full(len(df), np.nan)
+    rows = np.flatnonzero((df['user'] != 'group_notification').to_numpy())
+    users = df['user'].to_numpy()[rows]
+    gaps = np.diff(df['date'].to_numpy()[rows]) / np.timedelta64(1, 's')
+    replies = users[1:] != users[:-1]
+    response_time[rows[1:][replies]] = gaps[replies]
+    df['response_time'] = response_time
+
+def _concat(frames, compact=False):
+    if not compact:
+        return pd.concat(frames, ignore_index=True)
+
+    # plain concat would fall back to object dtype when frames have different user categories
+    users = union_categoricals([frame['user'] for frame in frames])
+    df = pd.concat([frame.drop(columns='user') for frame in frames], ignore_index=True)
+    df.insert(1, 'user', users)
     return df
 
-    
\ No newline at end of file
+def _parse(source, chunk_size=CHUNK_SIZE, compact=False, dialect=None, date_format=None):
+    # single pass over the export: date, user and message are split out line by line
+    # and flushed to a DataFrame every chunk_size rows, so only one chunk lives as python lists at a time;
+    # returns (df, dialect, date format), the format is detected unless given
+    lines = _iter_lines(source)
+    sample = []
+    size = 0
+    for line in lines:
+        sample.append(line)
+        size += len(line)
+        if size >= SAMPLE_SIZE:
+            break
+    settled = True
+    if date_format is None:
+        dialect, date_format = detect_dialect(sample, dialect)
+        headers = [match for match in map(dialect.pattern.match, sample) if match]
+        # only days <= 12 in the sample (e.g. a month/day chat starting early in a month): parsing goes on with
+        # the dates kept as text until one of them settles the order (day first if none does)
+        settled = any(_day_first(match['first'], match['second']) is not None for match in headers)
+    else:
+        dialect = DIALECTS[dialect]
+    lines = itertools.chain(sample, lines)
+
+    def convert(chunks):
+        for chunk in chunks:
+            chunk['date'] = pd.to_datetime(chunk['date'], format=date_format)
+
+    chunks = []
+    dates, users, messages = [], [], []
+    for date, message in _iter_messages(lines, dialect):
+        if not settled:
+            order = _day_first(*date.split('/', 2)[:2])
+            if order is not None:
+                date_format, settled = _with_order(date_format, order), True
+                convert(chunks)
+        user, message = _split_user(message)
+        dates.append(date)
+        users.append(user)
+        messages.append(message)
+        if len(dates) >= chunk_size:
+            chunks.append(_build_chunk(dates, users, messages, date_format if settled else None, compact))
+            dates, users, messages = [], [], []
+    if dates or not chunks:
+        chunks.append(_build_chunk(dates, users, messages, date_format if settled else None, compact))
+    if not settled:
+        convert(chunks)
+
+    return _concat(chunks, compact), dialect, date_format
+
+def parse_chat(source, chunk_size=CHUNK_SIZE, compact=False, dialect=None):
+    return _parse(source, chunk_size, compact, dialect)[0]
+
+def preprocess(data, chunk_size=CHUNK_SIZE, compact=False, dialect=None):
+    df = parse_chat(data, chunk_size=chunk_size, compact=compact, dialect=dialect)
+
+    _add_time_columns(df, compact=compact)
+    _add_message_type(df)
+
+    df = df.sort_values(by='date', kind='stable').reset_index(drop=True)
+    _add_response_time(df)
+
+    return df
+
+def _digest(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def _last_message_offset(data, dialect):
+    # byte offset of the last line that opens a message, found by walking the lines back from the end
+    end = len(data)
+    while end > 0:
+        start = data.rfind(b'\n', 0, end - 1) + 1
+        if dialect.pattern.match(data[start:end].decode('utf-8', 'replace')):
+            return start
+        end = start
+    return 0
+
+def extends(data, state):
+    # whether the export bytes start with the export described by state
+    return state is not None and len(data) >= state.size and _digest(memoryview(data)[:state.size]) == state.digest
+
+def ingest(data, previous=None, chunk_size=CHUNK_SIZE, compact=False, dialect=None):
+    # preprocess for an export given as bytes, returning (df, state, added, removed). previous is (df, state)
+    # of an earlier ingest; when this export extends it, parsing starts at its last message (whose text may
+    # go on in the new export): removed is the earlier row for that message and added the rows parsed from
+    # there, so aggregates of the earlier frame can be updated instead of rebuilt. Otherwise the whole export
+    # is parsed, added is the whole frame and removed is None.
+    data = bytes(data)
+    old = removed = date_format = None
+    offset = 0
+    if previous is not None and extends(data, previous[1]):
+        old, state = previous
+        offset, dialect, date_format = state.tail_offset, state.dialect, state.date_format
+        removed = old.iloc[[state.tail_row]]
+        old = old.drop(index=old.index[state.tail_row])
+
+    added, dialect, date_format = _parse(memoryview(data)[offset:], chunk_size, compact, dialect, date_format)
+    if added.empty:
+        # no message headers (an empty or non-chat file): the same columns as preprocess, without rows
+        _add_time_columns(added, compact=compact)
+        _add_message_type(added)
+        _add_response_time(added)
+        return added, None, added, removed
+    last_date = added['date'].iloc[-1]    # last message of the export, rows are still in file order
+
+    _add_time_columns(added, compact=compact)
+    _add_message_type(added)
+    added = added.sort_values(by='date', kind='stable').reset_index(drop=True)
+
+    df = added
+    if old is not None:
+        # the new rows come after every earlier row in the export, so a stable sort keeps the full-parse order
+        df = _concat([old, added], compact).sort_values(by='date', kind='stable').reset_index(drop=True)
+    _add_response_time(df)
+
+    state = Ingested(
+        size=len(data),
+        digest=_digest(data),
+        tail_offset=_last_message_offset(data, dialect),
+        tail_row=int(df['date'].searchsorted(last_date, side='right')) - 1,    # equal dates keep export order
+        dialect=dialect.name,
+        date_format=date_format
+    )
+    return df, state, added, removed
@@ -0,0 +1,94 @@
+import io
+import json
+import time
+import logging
+import cProfile
+import pstats
+import threading
+import weakref
+import tracemalloc
+import pandas as pd
+
+# Opt-in instrumentation of the helper calls: wall time, input rows and peak memory of every call, each
+# record also logged as one JSON line on the 'messagemetrics.timings' logger, and an optional cProfile
+# of one chosen helper.
+
+logger = logging.getLogger('messagemetrics.timings')
+PROFILE_LINES = 30    # functions listed in a profile report
+
+_memory_sessions = weakref.WeakSet()    # tokens of the sessions tracking peak memory
+_memory_lock = threading.Lock()
+
+class MemoryToken:
+    # one per session, kept in its session state; a session that goes away stops counting once it is collected
+    pass
+
+def track_memory(token, enabled):
+    # tracemalloc is process-wide and slows every allocation down, so it runs while at least one session asks
+    # for it: a session that doesn't ask never stops it under one that is measuring
+    with _memory_lock:
+        if enabled:
+            _memory_sessions.add(token)
+        else:
+            _memory_sessions.discard(token)
+        if _memory_sessions and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        elif not _memory_sessions and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+def _rows(args, result):
+    # rows of the first frame passed in, or of the frame produced (preprocess)
+    for value in list(args) + [result[0] if isinstance(result, tuple) and result else result]:
+        if isinstance(value, pd.DataFrame):
+            return len(value)
+    return None
+
+class Timings:
+    # the records of one script run; safe to fill from the section worker threads
+    def __init__(self, memory=False, profile=None):
+        self.memory = memory
+        self.profile = profile    # helper name to run under cProfile
+        self.records = []
+        self.reports = {}    # helper name -> pstats text
+        self._lock = threading.Lock()
+
+    def call(self, name, selected_user, func, *args, **kwargs):
+        profiler = cProfile.Profile() if name == self.profile else None
+        memory = self.memory and tracemalloc.is_tracing()
+        if memory:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        if profiler:
+            profiler.enable()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            if profiler:
+                profiler.disable()
+            seconds = time.perf_counter() - start
+        record = {
+            'helper': name,
+            'user': selected_user,
+            'seconds': round(seconds, 6),
+            'rows': _rows(args, result),
+            'peak_bytes': tracemalloc.get_traced_memory()[1] - before if memory else None,
+        }
+        with self._lock:
+            self.records.append(record)
+            if profiler:
+                report = io.StringIO()
+                pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(PROFILE_LINES)
+                self.reports[name] = report.getvalue()
+        logger.info(json.dumps(record))
+        return result
+
+    def table(self):
+        # slowest first
+        with self._lock:
+            records = list(self.records)
+        return pd.DataFrame(records, columns=['helper', 'user', 'seconds', 'rows', 'peak_bytes']).sort_values('seconds', ascending=False)
+
+    def to_json(self):
+        with self._lock:
+            return json.dumps({'records': self.records, 'profiles': self.reports}, indent=1)
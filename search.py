@@ -0,0 +1,113 @@
+from bisect import bisect_left
+from itertools import chain
+import numpy as np
+import pandas as pd
+import helper
+
+# Full-text search over a chat. The index maps every term (the wordcloud's tokens, lower-cased) to the
+# distinct messages containing it, and every row to its distinct message, so a query intersects a few
+# posting lists and picks the matching rows with one array lookup; df['message'] is only read while building.
+# The date filter is a binary search on the (sorted) dates and the user filter compares integer codes.
+# browse pages through the whole chat with the same filters and no index.
+
+PAGE_SIZE = 50    # results shown per page
+
+def date_window(dates, start=None, end=None, ordered=True):
+    # (first row, row after the last, mask over those rows or None) of the messages sent from start to end
+    # (dates, both days included); on ordered dates the window is found by binary search
+    lo, hi, mask = 0, len(dates), None
+    start = None if start is None else np.datetime64(pd.Timestamp(start))
+    end = None if end is None else np.datetime64(pd.Timestamp(end) + pd.Timedelta(days=1))
+    if ordered:
+        if start is not None:
+            lo = np.searchsorted(dates, start)
+        if end is not None:
+            hi = np.searchsorted(dates, end)
+    elif start is not None or end is not None:
+        mask = np.ones(len(dates), dtype=bool)
+        if start is not None:
+            mask &= dates >= start
+        if end is not None:
+            mask &= dates < end
+    return lo, max(lo, hi), mask
+
+class SearchIndex:
+    def __init__(self, df):
+        codes, messages = pd.factorize(df['message'])
+        postings = {}    # term -> distinct message numbers, ascending
+        for number, message in enumerate(messages):
+            for term in {word.lower() for word in helper.tokenize(message)}:
+                postings.setdefault(term, []).append(number)
+
+        # terms sorted so the terms sharing a prefix are one range of the posting arrays
+        self.terms = sorted(postings)
+        self._term_ids = {term: i for i, term in enumerate(self.terms)}
+        self._offsets = np.zeros(len(self.terms) + 1, dtype=np.int64)
+        np.cumsum([len(postings[term]) for term in self.terms], out=self._offsets[1:])
+        self._postings = np.fromiter(chain.from_iterable(postings[term] for term in self.terms), dtype=np.int32,
+                                     count=int(self._offsets[-1]))
+        self._messages = len(messages)
+        self._codes = codes.astype(np.int32)    # row -> distinct message number
+
+        users, self.users = pd.factorize(df['user'])
+        self._users = users.astype(np.int32)
+        self._dates = df['date'].to_numpy()
+        self._sorted = bool((self._dates[1:] >= self._dates[:-1]).all())
+
+        # what the results cache counts for this index
+        self.nbytes = (self._offsets.nbytes + self._postings.nbytes + self._codes.nbytes + self._users.nbytes
+                       + self._dates.nbytes + sum(2 * (len(term) + 80) for term in self.terms))
+
+    def _matches(self, term, prefix=False):
+        # distinct message numbers containing the term, or any term starting with it
+        if prefix:
+            first, last = bisect_left(self.terms, term), bisect_left(self.terms, term + '\U0010ffff')
+            return np.unique(self._postings[self._offsets[first]:self._offsets[last]])
+        i = self._term_ids.get(term)
+        if i is None:
+            return self._postings[:0]
+        return self._postings[self._offsets[i]:self._offsets[i + 1]]
+
+    def search(self, query, user=None, start=None, end=None):
+        # ascending row positions of the messages containing every word of the query, optionally only those
+        # sent by user and between the start and end dates; a word ending in * matches as a prefix
+        found = None
+        for part in query.split():
+            words = [word.lower() for word in helper.tokenize(part)]
+            for i, word in enumerate(words):
+                matches = self._matches(word, part.endswith('*') and i == len(words) - 1)
+                found = matches if found is None else np.intersect1d(found, matches, assume_unique=True)
+        if found is None or not len(found):
+            return np.empty(0, dtype=np.int64)
+
+        matching = np.zeros(self._messages, dtype=bool)
+        matching[found] = True
+        lo, hi, mask = date_window(self._dates, start, end, self._sorted)
+        hit = matching[self._codes[lo:hi]]
+        if mask is not None:
+            hit &= mask
+        if user is not None:
+            user_code = np.flatnonzero(np.asarray(self.users) == user)
+            if not len(user_code):
+                return np.empty(0, dtype=np.int64)
+            hit &= self._users[lo:hi] == user_code[0]
+        return lo + np.flatnonzero(hit)
+
+def browse(df, user=None, start=None, end=None):
+    # row positions of the messages sent by user between the start and end dates, for paging through the chat
+    # without the index; unfiltered they are a range, so nothing the size of the chat is built
+    dates = df['date']
+    lo, hi, mask = date_window(dates.to_numpy(), start, end, dates.is_monotonic_increasing)
+    if user is not None:
+        sent = (df['user'].iloc[lo:hi] == user).to_numpy()
+        mask = sent if mask is None else mask & sent
+    if mask is None:
+        return range(lo, hi)
+    return lo + np.flatnonzero(mask)
+
+def page(rows, number, size=PAGE_SIZE):
+    # the row positions shown on page number (counting from 1)
+    return rows[(number - 1) * size:number * size]
+
+def pages(rows, size=PAGE_SIZE):
+    return max(1, -(-len(rows) // size))
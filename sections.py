@@ -0,0 +1,383 @@
+from collections import namedtuple
+import streamlit as st
+import pandas as pd
+import seaborn as sns
+import helper, charts
+
+# Every dashboard section is a title, a renderer and the helper calls it needs. The renderers only draw
+# the section body: they get (selected_user, user_list, *helper results) so the results can be computed
+# anywhere first, and the app decides when (and whether) a section is computed at all.
+
+# A helper argument that is itself a chat-level helper result (the same for every selected user). The app
+# computes it the first time a section needs it and caches it per export.
+Shared = namedtuple('Shared', ['name', 'args'])
+
+def render_summary(selected_user, user_list, summary):
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Messages", summary['messages'])
+    col2.metric("Participants", summary['participants'])
+    col3.metric("Active Days", summary['active_days'])
+    col4.metric("Period", f"{summary['first_date']} – {summary['last_date']}")
+
+def render_top_statistics(selected_user, user_list, stats):
+    num_messages, words, num_media_messages, links, num_emojis, num_stickers = stats
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.markdown("### 📱 Total Messages")
+        st.title(num_messages)
+    with col2:
+        st.markdown("### 📝 Total Words")
+        st.title(words)
+    with col3:
+        st.markdown("### 🖼️ Total Media")
+        st.title(num_media_messages)
+
+    col4, col5, col6 = st.columns(3)
+    with col4:
+        st.markdown("### 🔗 Total Links")
+        st.title(links)
+    with col5:
+        st.markdown("### 😊 Total Emojis")
+        st.title(num_emojis)
+    with col6:
+        st.markdown("### 🎯 Total Stickers")
+        st.title(num_stickers)
+
+def render_chat_information(selected_user, user_list, chat_info):
+    col1, col2 = st.columns(2)
+    with col1:
+        st.info(f"First Message Date: **{chat_info['first_message_date']}**")
+    with col2:
+        if selected_user == 'Overall':
+            st.info(f"Chat Age: **{chat_info['chat_age']}**")
+
+    st.title("💬 First Message")
+    st.markdown(
+        f"""
+        <div style='padding: 1.5rem; border-radius: 8px; background-color: #ffffff; border-left: 5px solid #2c3e50; margin: 1rem 0; box-shadow: 0 2px 4px rgba(0,0,0,0.1);'>
+            <p style='color: #1f1f1f; font-weight: bold; margin-bottom: 8px; font-size: 1.2em;'>{chat_info['first_message_user']}</p>
+            <p style='color: #2c3e50; margin: 0; font-size: 1.3em; background-color: #f8f9fa; padding: 1rem; border-radius: 5px;'>{chat_info['first_message']}</p>
+            <p style='color: #666; font-size: 1em; margin-top: 12px;'>{chat_info['first_message_date']}</p>
+        </div>
+        """,
+        unsafe_allow_html=True
+    )
+
+def render_voice_messages(selected_user, user_list, voice_counts):
+    if not voice_counts.empty:
+        col1, col2 = st.columns(2)
+        with col1:
+            st.dataframe(voice_counts)
+        with col2:
+            with charts.figure(figsize=(10, 6)) as (fig, ax):
+                width = 0.4 if selected_user != 'Overall' else 0.8
+                ax.bar(voice_counts['User'], voice_counts['Voice Message Count'],
+                      width=width, color='#008080') #teal
+                ax.set_xlabel("User", fontsize=12)
+                ax.set_ylabel("Number of Voice Messages", fontsize=12)
+                ax.tick_params(axis='x', labelrotation=90 if len(user_list) > 3 else 0)
+                st.pyplot(fig)
+    else:
+        st.write("No voice messages found in the chat.")
+
+def render_most_active_users(selected_user, user_list, active_users):
+    x, new_df = active_users
+    col1, col2 = st.columns(2)
+    with col1:
+        with charts.figure() as (fig, ax):
+            ax.bar(x.index, x.values, color='#008080', width=0.8) #teal
+            ax.tick_params(axis='x', labelrotation=90 if len(user_list) > 3 else 0)
+            st.pyplot(fig)
+    with col2:
+        st.dataframe(new_df)
+
+def render_call_analysis(selected_user, user_list, calls):
+    call_data, call_message = calls
+    if call_message:
+        st.write(call_message)
+    else:
+        st.dataframe(call_data)
+        with charts.figure() as (fig, ax):
+            width = 0.4 if selected_user != 'Overall' else 0.8
+            ax.bar(call_data['Call Type'], call_data['Count'], color=['#39FF14', '#2a3439'], width=width)
+            ax.set_xlabel("Call Type", fontsize=12)
+            ax.set_ylabel("Count", fontsize=12)
+            ax.set_title("Number of Voice and Video Calls", fontsize=14)
+            st.pyplot(fig)
+
+def render_wordcloud(selected_user, user_list, png):
+    st.image(png)
+
+def render_emoji_analysis(selected_user, user_list, emoji_df):
+    col1, col2 = st.columns(2)
+    if emoji_df.empty:
+        st.write("No emojis found in the messages.")
+    else:
+        with col1:
+            st.dataframe(emoji_df)
+        with col2:
+            with charts.figure() as (fig, ax):
+                ax.pie(emoji_df['Count'], labels=emoji_df['Emoji'], autopct='%1.1f%%')
+                st.pyplot(fig)
+
+def render_monthly_timeline(selected_user, user_list, monthly_timeline):
+    if charts.native():
+        months = pd.to_datetime(pd.DataFrame({'year': monthly_timeline['year'], 'month': monthly_timeline['month_num'], 'day': 1}))
+        st.line_chart(monthly_timeline.assign(month=months), x='month', y='message', color='#9955bb')
+    else:
+        with charts.figure() as (fig, ax):
+            ax.plot(monthly_timeline['month'], monthly_timeline['message'], color='#9955bb') #purple
+            ax.tick_params(axis='x', labelrotation=90)
+            st.pyplot(fig)
+
+def render_daily_timeline(selected_user, user_list, daily_timeline):
+    if daily_timeline is not None and not daily_timeline.empty and charts.native():
+        st.line_chart(daily_timeline, x='only_date', y='message', color='#00416A')
+    elif daily_timeline is not None and not daily_timeline.empty:
+        with charts.figure() as (fig, ax):
+            ax.plot(daily_timeline['only_date'], daily_timeline['message'], color='#00416A') #dark blue
+            ax.tick_params(axis='x', labelrotation=90)
+            st.pyplot(fig)
+    else:
+        st.write("No data available for the daily timeline.")
+
+def render_activity_charts(selected_user, user_list, busy_day, busy_month):
+    col1,col2 = st.columns(2)
+    with col1:
+        st.header("Most busy day")
+        with charts.figure() as (fig, ax):
+            ax.bar(busy_day.index, busy_day.values, color='#00416A') #blueberry
+            ax.tick_params(axis='x', labelrotation=90)
+            st.pyplot(fig)
+    with col2:
+        st.header("Most busy month")
+        with charts.figure() as (fig, ax):
+            ax.bar(busy_month.index, busy_month.values, color='#65000B') # rosewood
+            ax.tick_params(axis='x', labelrotation=90)
+            st.pyplot(fig)
+
+def render_activity_heatmap(selected_user, user_list, heatmap):
+    with charts.figure(figsize=(10, 6)) as (fig, ax):
+        sns.heatmap(heatmap, ax=ax)
+        st.pyplot(fig)
+
+def render_response_times(selected_user, user_list, response):
+    response_times, fastest_responder, histogram = response
+    if not response_times.empty:
+        col1, col2 = st.columns(2)
+        with col1:
+            st.header("Average Response Time")
+            st.dataframe(response_times)
+        with col2:
+            if fastest_responder is not None:
+                st.header("Fastest Responder")
+                st.write(f"User: {fastest_responder['user']}")
+                st.write(f"Average Response Time: {fastest_responder['avg_response_time']:.2f} seconds")
+            else:
+                st.header("Response Time Analysis")
+                st.write("No fastest responder data available.")
+        col3, col4 = st.columns(2)
+        with col3:
+            st.header("Response Time Distribution")
+            totals = histogram.sum()
+            with charts.figure() as (fig, ax):
+                ax.bar(totals.index, totals.values, color='#008080') #teal
+                ax.set_xlabel("Response Time", fontsize=12)
+                ax.set_ylabel("Number of Replies", fontsize=12)
+                st.pyplot(fig)
+        with col4:
+            st.header("Replies per Bucket")
+            st.dataframe(histogram)
+    else:
+        st.write("No response time data available for analysis.")
+
+def render_first_message_of_day(selected_user, user_list, first_message_counts):
+    if selected_user == 'Overall' and not first_message_counts.empty:
+        with charts.figure(figsize=(10, 6)) as (fig, ax):
+            ax.bar(first_message_counts['user'], first_message_counts['first_message_count'], width=0.8, color='#008080') #teal
+            ax.set_xlabel("User", fontsize=12)
+            ax.set_ylabel("First Message Count", fontsize=12)
+            ax.tick_params(axis='x', labelrotation=90 if len(user_list) > 3 else 0)
+            st.pyplot(fig)
+    elif not first_message_counts.empty:
+        st.dataframe(first_message_counts)
+    else:
+        st.write("No data available for first message analysis.")
+
+def render_late_night_activity(selected_user, user_list, late_night_counts):
+    if selected_user == 'Overall' and not late_night_counts.empty:
+        with charts.figure(figsize=(10, 6)) as (fig, ax):
+            ax.bar(late_night_counts['user'], late_night_counts['late_night_message_count'], width=0.8, color='#008080') #teal
+            ax.set_xlabel("User", fontsize=12)
+            ax.set_ylabel("No. of Messages", fontsize=12)
+            ax.tick_params(axis='x', labelrotation=90 if len(user_list) > 3 else 0)
+            st.pyplot(fig)
+    elif not late_night_counts.empty:
+        st.dataframe(late_night_counts)
+    else:
+        st.write("No late-night activity detected.")
+
+def render_longest_streaks(selected_user, user_list, streaks):
+    if not streaks.empty:
+        col1, col2 = st.columns(2)
+        with col1:
+            with charts.figure(figsize=(10, 6)) as (fig, ax):
+
+                # Create the bar chart
+                labels = streaks['start'].astype(str) + ' → ' + streaks['end'].astype(str)
+                ax.bar(labels, streaks['days'], color='#00416A') #dark blue
+
+                ax.set_xlabel("Streak", fontsize=12)
+                ax.set_ylabel("Consecutive Days", fontsize=12)
+                ax.tick_params(axis='x', labelrotation=90)
+                st.pyplot(fig)
+        with col2:
+            st.dataframe(streaks, hide_index=True)
+    else:
+        st.write("No data available for longest streaks analysis.")
+
+def render_conversations(selected_user, user_list, conversations):
+    summary, starters, longest = conversations
+    if summary is None:
+        st.write("No conversations found.")
+        return
+    cols = st.columns(len(summary))
+    for col, (name, value) in zip(cols, summary.items()):
+        col.metric(name.replace('_', ' ').capitalize(), value)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.header("Conversation Starters")
+        with charts.figure(figsize=(10, 6)) as (fig, ax):
+            ax.bar(starters['user'].astype(str), starters['conversations_started'], color='#FF8C00') #dark orange
+            ax.set_xlabel("User", fontsize=12)
+            ax.set_ylabel("Conversations Started", fontsize=12)
+            ax.tick_params(axis='x', labelrotation=90 if len(starters) > 3 else 0)
+            st.pyplot(fig)
+    with col2:
+        st.header("Longest Conversations")
+        st.dataframe(longest, hide_index=True)
+
+def render_text_length(selected_user, user_list, text_length_df):
+    if not text_length_df.empty:
+        if selected_user == 'Overall':
+            with charts.figure(figsize=(10, 6)) as (fig, ax):
+                ax.bar(text_length_df['User'], text_length_df['Average Message Length'], width=0.8, color='#008080') #teal
+                ax.set_xlabel("User")
+                ax.set_ylabel("Average Message Length (characters)")
+                ax.tick_params(axis='x', labelrotation=90 if len(user_list) > 3 else 0)
+                st.pyplot(fig)
+        else:
+            # For individual user, show a metric display instead of bar chart
+            col1, col2 = st.columns(2)
+            with col1:
+                st.metric(
+                    label="Average Message Length",
+                    value=f"{text_length_df['Average Message Length'].iloc[0]:.1f} characters",
+                    help="Average number of characters per message"
+                )
+            with col2:
+                st.dataframe(text_length_df)
+    else:
+        st.write("No text length data available for analysis.")
+
+def render_deleted_messages(selected_user, user_list, deletion_stats):
+    if not deletion_stats.empty:
+        col1, col2 = st.columns(2)
+        with col1:
+            st.dataframe(deletion_stats)
+        with col2:
+            with charts.figure(figsize=(10, 6)) as (fig, ax):
+                width = 0.4 if selected_user != 'Overall' else 0.8
+                ax.bar(deletion_stats['User'], deletion_stats['Deleted Messages'],
+                      width=width, color='#008080') #teal
+                ax.set_xlabel("User", fontsize=12)
+                ax.set_ylabel("Number of Deleted Messages", fontsize=12)
+                ax.tick_params(axis='x', labelrotation=90 if len(user_list) > 3 else 0)
+
+                # Add percentage labels on top of bars
+                for i, v in enumerate(deletion_stats['Deleted Messages']):
+                    percentage = deletion_stats['Deletion Rate (%)'].iloc[i]
+                    ax.text(i, v, f'{percentage}%',
+                           ha='center', va='bottom')
+                st.pyplot(fig)
+    else:
+        st.write("No deleted messages found in the chat.")
+
+def render_group_dynamics(selected_user, user_list, dynamics):
+    mentions_summary, reply_summary, group_message = dynamics
+    if group_message:
+        st.write(group_message)
+    else:
+        # Mentions Analysis
+        st.header("Mentions Analysis")
+        if not mentions_summary.empty:
+            col1, col2 = st.columns(2)
+            with col1:
+                st.dataframe(mentions_summary)
+            with col2:
+                with charts.figure(figsize=(10, 6)) as (fig, ax):
+                    width = 0.4 if selected_user != 'Overall' else 0.8
+                    ax.bar(mentions_summary['Mentioned_by'], mentions_summary['Mention_count'],
+                          color='#4B0082', width=width)  # indigo
+                    ax.tick_params(axis='x', labelrotation=90)
+                    ax.set_xlabel("User")
+                    ax.set_ylabel("Number of Mentions Made")
+                    st.pyplot(fig)
+        else:
+            st.write("No mentions found in the chat")
+
+        # Reply Patterns Analysis
+        st.header("Reply Patterns")
+        if not reply_summary.empty:
+            col1, col2 = st.columns(2)
+            with col1:
+                st.dataframe(reply_summary)
+            with col2:
+                # Create a heatmap of reply patterns
+                reply_matrix = reply_summary.pivot_table(
+                    index='From', columns='To', values='Reply_count', fill_value=0
+                )
+                with charts.figure(figsize=(10, 6)) as (fig, ax):
+                    sns.heatmap(reply_matrix, annot=True, cmap='YlOrRd', fmt='g', ax=ax)
+                    ax.set_title("Reply Patterns Heatmap")
+                    st.pyplot(fig)
+        else:
+            st.write("No reply patterns found in the chat")
+
+def section_jobs(selected_user, df, cube, wordcloud_words=helper.WORDCLOUD_MAX_WORDS, idle_seconds=helper.RESPONSE_IDLE_SECONDS,
+                 session_gap=helper.SESSION_GAP_SECONDS):
+    # (title, renderer, [(helper name, args), ...]) in page order; the renderer gets the helper results in the same order
+    if selected_user == 'Overall':
+        chat_info = ('get_chat_age', (df,))
+    else:
+        chat_info = ('get_user_first_message', (selected_user, df))
+
+    jobs = [
+        ("Top Statistics", render_top_statistics, [('fetch_stats', (selected_user, df, Shared('build_emoji_counts', (df,))))]),
+        ("📝 Chat Information", render_chat_information, [chat_info]),
+        ("🎤 Voice Message Analysis", render_voice_messages, [('voice_message_analysis', (selected_user, df))]),
+    ]
+    if selected_user == 'Overall':
+        jobs.append(("👥 Most Active Users", render_most_active_users, [('most_active_users', (df,))]))
+    jobs += [
+        ("📞 Call Analysis", render_call_analysis, [('call_analysis', (selected_user, df))]),
+        ("☁️ Wordcloud", render_wordcloud, [('wordcloud_image', (selected_user, df, Shared('build_word_counts', (df, helper.WORDCLOUD_STOPWORDS)),
+                                                                 helper.WORDCLOUD_SIZE, wordcloud_words))]),
+        ("😀 Emoji Analysis", render_emoji_analysis, [('emoji_helper', (selected_user, df, Shared('build_emoji_counts', (df,))))]),
+        ("📅 Monthly Timeline", render_monthly_timeline, [('monthly_timeline', (selected_user, df, cube))]),
+        ("📆 Daily Timeline", render_daily_timeline, [('daily_timeline', (selected_user, df, cube))]),
+        ("📈 Activity Charts", render_activity_charts, [('week_activity_map', (selected_user, df, cube)),
+                                                        ('month_activity_map', (selected_user, df, cube))]),
+        ("📊 Activity Heatmap", render_activity_heatmap, [('activity_heatmap', (selected_user, df, cube))]),
+        ("⚡ Response Time Analysis", render_response_times, [('response_time_analysis', (selected_user, df, idle_seconds))]),
+        ("🌅 First Message of the Day", render_first_message_of_day, [('first_message_of_day', (selected_user, df))]),
+        ("🌙 Late Night Activity (12 AM - 3 AM)", render_late_night_activity, [('late_night_activity', (selected_user, df, cube))]),
+        ("🔥 Longest Daily Streaks", render_longest_streaks, [('longest_streaks', (selected_user, df, cube))]),
+        ("🗨️ Conversations", render_conversations, [('conversation_analysis', (selected_user, df, Shared('build_sessions', (df, session_gap))))]),
+        ("📏 Text Length Analysis", render_text_length, [('text_length_analysis', (selected_user, df))]),
+        ("🗑️ Message Deletion Analysis", render_deleted_messages, [('analyze_deleted_messages', (selected_user, df))]),
+        ("💭 Group Dynamics Analysis", render_group_dynamics, [('analyze_group_dynamics', (selected_user, df))]),
+    ]
+    return jobs